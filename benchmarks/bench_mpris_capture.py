@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# Compare D-Bus round trips and latency of the batched Properties.GetAll
+# capture against the old one-Get-per-property capture.
+#
+#   python benchmarks/bench_mpris_capture.py [--iterations N]
+#
+# Runs against a private dbus-daemon, prints JSON.
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.modules.setdefault("obspython", types.ModuleType("obspython"))
+
+from dbus_next.aio.message_bus import MessageBus
+
+import smcinfo
+from fakeplayer import MPRIS_PATH, private_bus, start_player
+
+
+async def legacy_capture(playerobj):
+    player = playerobj.get_interface("org.mpris.MediaPlayer2.Player")
+    await player.get_metadata()
+    await player.get_position()
+    await player.get_playback_status()
+    await player.get_loop_status()
+    await player.get_rate()
+
+
+async def batched_capture(playerobj):
+    await smcinfo.players["org.mpris.MediaPlayer2.bench"].capture()
+
+
+async def measure(bus: MessageBus, playerobj, capture, iterations: int) -> dict:
+    calls = 0
+    call = bus.call
+
+    async def counting_call(msg):
+        nonlocal calls
+        calls += 1
+        return await call(msg)
+
+    bus.call = counting_call # type: ignore
+    try:
+        await capture(playerobj) # warm up
+        calls = 0
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await capture(playerobj)
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        bus.call = call # type: ignore
+    samples.sort()
+    return {
+        "round_trips_per_capture": calls / iterations,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+async def main(iterations: int) -> dict:
+    playerbus, _ = await start_player("bench")
+    bus = await MessageBus().connect()
+    introspection = await bus.introspect("org.mpris.MediaPlayer2.bench", MPRIS_PATH)
+    playerobj = bus.get_proxy_object("org.mpris.MediaPlayer2.bench", MPRIS_PATH, introspection)
+    smcinfo.mprisImport()
+    smcinfo.bus = bus
+    smcinfo.players["org.mpris.MediaPlayer2.bench"] = smcinfo.MprisPlayer("org.mpris.MediaPlayer2.bench")
+    try:
+        return {
+            "iterations": iterations,
+            "legacy": await measure(bus, playerobj, legacy_capture, iterations),
+            "getall": await measure(bus, playerobj, batched_capture, iterations),
+        }
+    finally:
+        bus.disconnect()
+        playerbus.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    with private_bus():
+        print(json.dumps(asyncio.run(main(args.iterations)), indent=2))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# Cost of binding a new snapshot and of rendering a tick, Python display
+# expressions against the equivalent templates.
+#
+#   python benchmarks/bench_render.py [--iterations N]
+#
+# Prints JSON, times in microseconds.
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import obsstub
+
+obsstub.install()
+
+import smcinfo
+
+CASES = {
+    "default": (smcinfo.DEFAULT_DISPLAY_EXPR, smcinfo.DEFAULT_DISPLAY_TEMPLATE),
+    "static": ("f'{artist} - {title}'", "{artist} - {title}"),
+    "album": (
+        "f'{artist} - {title}' + (f' ({album_title})' if album_title else '')",
+        "{artist} - {title}{?album_title} ({album_title}){/}",
+    ),
+    # reads of a := name must not be hoisted ahead of the assignment
+    "walrus": ("f'{a} - {title}' if (a := artist) else title", "{?artist}{artist} - {/}{title}"),
+}
+
+
+def snapshot() -> smcinfo.MediaSnapshot:
+    return smcinfo.MediaSnapshot(
+        artist="Daft Punk",
+        title="Get Lucky",
+        album_title="Random Access Memories",
+        position=timedelta(seconds=42),
+        last_updated_time=datetime.now(timezone.utc),
+        end_time=timedelta(seconds=369),
+        playback_status="Playing",
+        playback_rate=1.0,
+    )
+
+
+def measure(display, iterations: int) -> dict[str, float]:
+    data = snapshot()
+    display.render(data)
+    return {
+        "bind_us": timeit.timeit(lambda: display.bind(data), number=iterations) / iterations * 1e6,
+        "render_us": timeit.timeit(lambda: display.render(data), number=iterations) / iterations * 1e6,
+    }
+
+
+def main(iterations: int) -> dict:
+    results = {}
+    for name, (expr, template) in CASES.items():
+        expr_display = smcinfo.DisplayExpr(expr)
+        template_display = smcinfo.DisplayTemplate(template)
+        assert expr_display.render(snapshot()) == template_display.render(snapshot()), name
+        results[name] = {
+            "expr": measure(expr_display, iterations),
+            "template": measure(template_display, iterations),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps({"iterations": args.iterations, **main(args.iterations)}, indent=2))
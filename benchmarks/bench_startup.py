@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# How long OBS spends importing smcinfo.py at startup, from -X importtime
+# in fresh interpreters (after a warm-up run, so the .pyc is cached).
+#
+#   python benchmarks/bench_startup.py [--runs N] [--budget METRIC=MAX ...]
+#
+# Prints JSON. Exits 1 if any metric is above its maximum or if a module that
+# should load on first use (aiohttp, the backends, ...) was imported anyway,
+# e.g. --budget import_ms_p50=100
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+# must not be imported before script_load/script_update use them
+LAZY = ("aiohttp", "dbus_next", "winrt", "PIL", "urllib.request", "http.client", "argparse")
+
+CHILD = f"""
+import sys, time
+sys.path[:0] = [{BENCHMARKS!r}, {ROOT!r}]
+import obsstub
+obsstub.install()
+start = time.perf_counter()
+import smcinfo
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    # (module, self us, cumulative us) of everything imported after obsstub
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        selftime, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(selftime), int(cumulative)))
+    names = [name for name, _, _ in rows]
+    return rows[names.index("obsstub") + 1:]
+
+
+def run_once() -> tuple[float, list[tuple[str, int, int]]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        capture_output=True, text=True, check=True,
+    )
+    return float(proc.stdout.strip().splitlines()[-1]), parse_importtime(proc.stderr)
+
+
+def main(runs: int) -> dict:
+    run_once() # writes the .pyc
+    walls = []
+    imports = []
+    for _ in range(runs):
+        wall, rows = run_once()
+        walls.append(wall)
+        imports.append(rows)
+    last = imports[-1]
+    totals = sorted(next(cumulative for name, _, cumulative in rows if name == "smcinfo") / 1000 for rows in imports)
+    walls.sort()
+    modules = {name for name, _, _ in last}
+    return {
+        "runs": runs,
+        "import_ms_p50": totals[len(totals) // 2],
+        "import_ms_max": totals[-1],
+        "wall_ms_p50": walls[len(walls) // 2],
+        "wall_ms_mean": statistics.fmean(walls),
+        "modules_imported": len(modules),
+        "eager": sorted(lazy for lazy in LAZY if lazy in modules),
+        "slowest_ms": {
+            name: selftime / 1000 for name, selftime, _ in sorted(last, key=lambda row: -row[1])[:10]
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", action="append", default=[], metavar="METRIC=MAX")
+    args = parser.parse_args()
+    results = main(args.runs)
+
+    failed = ["eager"] if results["eager"] else []
+    for budget in args.budget:
+        metric, _, limit = budget.partition("=")
+        if metric not in results:
+            parser.error(f"unknown metric {metric!r}")
+        if results[metric] > float(limit):
+            failed.append(metric)
+    results["failed"] = failed
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if failed else 0)
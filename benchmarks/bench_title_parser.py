@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Check the now_playing.py window title rules against a corpus of real
+# titles and compare their cost with the old per-player slicing lambdas.
+#
+#   python benchmarks/bench_title_parser.py [--iterations N]
+#
+# Prints JSON. Exits 1 if any title in the corpus parses wrong.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import obsstub
+
+obsstub.install()
+
+import now_playing
+
+# (player, window title, expected fields or None)
+CORPUS = [
+    ("spotify", "Daft Punk - Get Lucky", {"artist": "Daft Punk", "title": "Get Lucky"}),
+    ("spotify", "Jay-Z - Empire State of Mind", {"artist": "Jay-Z", "title": "Empire State of Mind"}),
+    ("spotify", "Bon Iver - Holocene - Live", {"artist": "Bon Iver", "title": "Holocene - Live"}),
+    ("spotify", "Spotify Premium", None),
+    ("vlc", "Radiohead - Paranoid Android - VLC media player", {"artist": "Radiohead", "title": "Paranoid Android"}),
+    ("vlc", "Bonobo - Kerala - Edit - VLC media player", {"artist": "Bonobo", "title": "Kerala - Edit"}),
+    ("vlc", "VLC media player", None),
+    ("yt_firefox", "Queen - Bohemian Rhapsody (Official Video) - YouTube — Mozilla Firefox",
+     {"artist": "Queen", "title": "Bohemian Rhapsody (Official Video)"}),
+    ("yt_firefox", "(3) Toto - Africa - YouTube — Mozilla Firefox", {"artist": "Toto", "title": "Africa"}),
+    ("yt_firefox", "Python docs — Mozilla Firefox", None),
+    ("yt_chrome", "a-ha - Take On Me (Official Video) - YouTube - Google Chrome",
+     {"artist": "a-ha", "title": "Take On Me (Official Video)"}),
+    ("yt_chrome", "Nujabes - Aruarian Dance - YouTube - Google Chrome", {"artist": "Nujabes", "title": "Aruarian Dance"}),
+    ("yt_chrome", "New Tab - Google Chrome", None),
+    ("foobar2000", "Pink Floyd - [The Wall #03] Another Brick in the Wall  [foobar2000]",
+     {"artist": "Pink Floyd", "title": "Another Brick in the Wall"}),
+    ("foobar2000", "Massive Attack - Teardrop [foobar2000]", {"artist": "Massive Attack", "title": "Teardrop"}),
+    ("foobar2000", "Untitled Track [foobar2000]", {"artist": "", "title": "Untitled Track"}),
+    ("foobar2000", "foobar2000 v2.1", None),
+    ("necloud", "晴天 - 周杰伦", {"artist": "周杰伦", "title": "晴天"}),
+    ("necloud", "Lemon - 米津玄師", {"artist": "米津玄師", "title": "Lemon"}),
+    ("necloud", "网易云音乐", None),
+    ("aimp", "Metallica - Nothing Else Matters", {"artist": "Metallica", "title": "Nothing Else Matters"}),
+    ("aimp", "AIMP", None),
+]
+
+
+def legacy_foobar2000(x: str) -> list[dict[str, str]]:
+    artist = ''
+    song = ''
+    if ("-" not in x) and (x.find('[foobar2000]') != -1):
+        song = x[:x.rfind(" [foobar2000]")-1]
+    elif "-" in x:
+        artist = x[0:x.find("-")-1]
+        song = x[x.find("]")+2:x.rfind(" [foobar2000]")-1]
+    return [{'artist': artist, 'title': song}] if artist or song else []
+
+
+LEGACY = {
+    'spotify': lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:]}] if '-' in x else [],
+    'vlc': lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:x.rfind('-')-1]}] if '-' in x else [],
+    'yt_firefox': lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:x.rfind('-')-1]}] if '- YouTube' in x else [],
+    'yt_chrome': lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:x.rfind('-')-1]}] if '- YouTube' in x else [],
+    'foobar2000': legacy_foobar2000,
+    'necloud': lambda x: [{'artist': x[x.find("-")+2:], 'title': x[0:x.find("-")-1]}] if '-' in x else [],
+    'aimp': lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:]}] if '-' in x else [],
+}
+
+
+def parsed(fields) -> dict[str, str] | None:
+    return dict(fields) if fields else None
+
+
+def legacy_parsed(result: list[dict[str, str]]) -> dict[str, str] | None:
+    return result[0] if result else None
+
+
+def measure(parse, iterations: int) -> float:
+    # ns per title, every title of the corpus once per iteration
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        for player, title, _ in CORPUS:
+            parse(player, title)
+    return (time.perf_counter_ns() - start) / (iterations * len(CORPUS))
+
+
+def main(iterations: int) -> dict:
+    wrong = [
+        {"player": player, "title": title, "expected": expected, "got": got}
+        for player, title, expected in CORPUS
+        if (got := parsed(now_playing.parse_title(player, title))) != expected
+    ]
+    legacy_wrong = sum(
+        legacy_parsed(LEGACY[player](title)) != expected for player, title, expected in CORPUS
+    )
+    uncached = now_playing.parse_title.__wrapped__
+    now_playing.parse_title.cache_clear()
+    return {
+        "titles": len(CORPUS),
+        "iterations": iterations,
+        "wrong": wrong,
+        "legacy_wrong": legacy_wrong,
+        "legacy_ns_per_title": measure(lambda player, title: LEGACY[player](title), iterations),
+        "rules_ns_per_title": measure(uncached, iterations),
+        "memoized_ns_per_title": measure(now_playing.parse_title, iterations),
+        "memo": now_playing.parse_title.cache_info()._asdict(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    results = main(args.iterations)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    sys.exit(1 if results["wrong"] else 0)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Cost of the now_playing.py window title captures per tick: one shared
+# enumeration with the PID->image cache against one enumeration and one
+# process lookup per window for every enabled capture, as before. Process
+# opens count both image lookups and the start time checks that validate the
+# cache; "shared_churn" changes one window title every tick, like a player
+# changing tracks, which revalidates that process.
+#
+#   python benchmarks/bench_window_capture.py [--ticks N] [--windows N]
+#
+# Uses SyntheticWindowProvider, so it runs on any OS. Prints JSON.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import obsstub
+
+obsstub.install()
+
+import now_playing
+
+PLAYERS = {
+    "spotify.exe": ["spotify"],
+    "vlc.exe": ["vlc"],
+    "firefox.exe": ["yt_firefox"],
+    "chrome.exe": ["yt_chrome"],
+    "foobar2000.exe": ["foobar2000"],
+    "aimp.exe": ["aimp"],
+}
+
+
+def synthetic_windows(count: int) -> list[tuple[int, str, str]]:
+    windows = [
+        (100, "spotify.exe", "Daft Punk - Get Lucky"),
+        (200, "chrome.exe", "Nujabes - Aruarian Dance - YouTube - Google Chrome"),
+        (300, "foobar2000.exe", "Massive Attack - Teardrop [foobar2000]"),
+    ]
+    # the rest of a desktop: a few windows per process
+    for i in range(count - len(windows)):
+        pid = 1000 + i // 3
+        windows.append((pid, f"app{pid}.exe", f"Window {i}"))
+    return windows
+
+
+def legacy_tick(provider: now_playing.SyntheticWindowProvider) -> list[dict]:
+    result = []
+    for image, players in PLAYERS.items():
+        for player in players:
+            for pid, title in provider.enumerate():
+                if provider.image_name(pid) == image:
+                    if fields := now_playing.parse_title(player, title):
+                        result.append(dict(fields))
+    return result
+
+
+def shared_tick(provider: now_playing.SyntheticWindowProvider) -> list[dict]:
+    return now_playing.captureWindowTitles(PLAYERS)
+
+
+def measure(tick, windows: list, ticks: int, churn: bool = False) -> dict:
+    provider = now_playing.SyntheticWindowProvider(windows)
+    now_playing.windowProvider = provider
+    samples = []
+    for i in range(ticks):
+        if churn:
+            provider.set_windows([(100, "spotify.exe", f"Daft Punk - Track {i}"), *windows[1:]])
+        start = time.perf_counter()
+        found = tick(provider)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "found": len(found),
+        "image_lookups_per_tick": provider.lookups / ticks,
+        "process_opens_per_tick": provider.opens / ticks,
+        "p50_ms": samples[len(samples) // 2],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main(ticks: int, count: int) -> dict:
+    windows = synthetic_windows(count)
+    return {
+        "windows": len(windows),
+        "processes": len({pid for pid, _, _ in windows}),
+        "captures": sum(len(players) for players in PLAYERS.values()),
+        "ticks": ticks,
+        "legacy": measure(legacy_tick, windows, ticks),
+        "shared": measure(shared_tick, windows, ticks),
+        "shared_churn": measure(shared_tick, windows, ticks, churn=True),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--windows", type=int, default=150)
+    args = parser.parse_args()
+    print(json.dumps(main(args.ticks, args.windows), indent=2))
@@ -0,0 +1,194 @@
+import contextlib
+import os
+import subprocess
+
+from dbus_next import PropertyAccess, Variant
+from dbus_next.aio.message_bus import MessageBus
+from dbus_next.service import ServiceInterface, dbus_property, method, signal
+
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+
+
+@contextlib.contextmanager
+def private_bus():
+    """Run a throwaway dbus-daemon and point DBUS_SESSION_BUS_ADDRESS at it"""
+    proc = subprocess.Popen(
+        ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert proc.stdout
+    address = proc.stdout.readline().strip()
+    previous = os.environ.get("DBUS_SESSION_BUS_ADDRESS")
+    os.environ["DBUS_SESSION_BUS_ADDRESS"] = address
+    try:
+        yield address
+    finally:
+        if previous is None:
+            os.environ.pop("DBUS_SESSION_BUS_ADDRESS", None)
+        else:
+            os.environ["DBUS_SESSION_BUS_ADDRESS"] = previous
+        proc.terminate()
+        proc.wait()
+
+
+class FakeRoot(ServiceInterface):
+    def __init__(self, identity: str):
+        super().__init__("org.mpris.MediaPlayer2")
+        self.identity = identity
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Identity(self) -> "s":
+        return self.identity
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanQuit(self) -> "b":
+        return False
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanRaise(self) -> "b":
+        return False
+
+    @dbus_property(access=PropertyAccess.READ)
+    def HasTrackList(self) -> "b":
+        return False
+
+    @dbus_property(access=PropertyAccess.READ)
+    def SupportedUriSchemes(self) -> "as":
+        return ["file"]
+
+    @dbus_property(access=PropertyAccess.READ)
+    def SupportedMimeTypes(self) -> "as":
+        return []
+
+    @method()
+    def Raise(self):
+        pass
+
+    @method()
+    def Quit(self):
+        pass
+
+
+class FakePlayer(ServiceInterface):
+    """Scriptable org.mpris.MediaPlayer2.Player"""
+
+    def __init__(self):
+        super().__init__("org.mpris.MediaPlayer2.Player")
+        self.status = "Playing"
+        self.loop_status = "None"
+        self.rate = 1.0
+        self.position = 0 # us
+        self.metadata: dict[str, Variant] = {}
+        self.set_track("Artist", "Title", length=180_000_000, notify=False)
+
+    def set_track(
+        self,
+        artist: str,
+        title: str,
+        *,
+        length: int = 180_000_000,
+        art_url: str | None = None,
+        notify: bool = True,
+    ):
+        self.position = 0
+        self.metadata = {
+            "mpris:trackid": Variant("o", f"/org/mpris/MediaPlayer2/Track/{abs(hash((artist, title)))}"),
+            "mpris:length": Variant("x", length),
+            "xesam:artist": Variant("as", [artist]),
+            "xesam:title": Variant("s", title),
+            "xesam:album": Variant("s", f"{title} (Single)"),
+        }
+        if art_url:
+            self.metadata["mpris:artUrl"] = Variant("s", art_url)
+        if notify:
+            self.emit_properties_changed({"Metadata": self.metadata})
+
+    def set_status(self, status: str):
+        self.status = status
+        self.emit_properties_changed({"PlaybackStatus": status})
+
+    def seek_to(self, position: int):
+        self.position = position
+        self.Seeked(position)
+
+    @signal()
+    def Seeked(self, position) -> "x":
+        return position
+
+    @dbus_property(access=PropertyAccess.READ)
+    def PlaybackStatus(self) -> "s":
+        return self.status
+
+    @dbus_property(access=PropertyAccess.READ)
+    def LoopStatus(self) -> "s":
+        return self.loop_status
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Rate(self) -> "d":
+        return self.rate
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Shuffle(self) -> "b":
+        return False
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Metadata(self) -> "a{sv}":
+        return self.metadata
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Volume(self) -> "d":
+        return 1.0
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Position(self) -> "x":
+        return self.position
+
+    @dbus_property(access=PropertyAccess.READ)
+    def MinimumRate(self) -> "d":
+        return 1.0
+
+    @dbus_property(access=PropertyAccess.READ)
+    def MaximumRate(self) -> "d":
+        return 1.0
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanGoNext(self) -> "b":
+        return True
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanGoPrevious(self) -> "b":
+        return True
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanPlay(self) -> "b":
+        return True
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanPause(self) -> "b":
+        return True
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanSeek(self) -> "b":
+        return True
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanControl(self) -> "b":
+        return True
+
+    @method()
+    def Play(self):
+        self.set_status("Playing")
+
+    @method()
+    def Pause(self):
+        self.set_status("Paused")
+
+
+async def start_player(name: str = "fake") -> tuple[MessageBus, FakePlayer]:
+    bus = await MessageBus().connect()
+    player = FakePlayer()
+    bus.export(MPRIS_PATH, FakeRoot(name))
+    bus.export(MPRIS_PATH, player)
+    await bus.request_name(f"org.mpris.MediaPlayer2.{name}")
+    return bus, player
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# End-to-end benchmark of smcinfo.py without OBS: the script runs against
+# obsstub and a fake MPRIS player on a private session bus.
+#
+#   python benchmarks/harness.py [--changes N] [--idle SECONDS] [--output FILE]
+#                                [--budget METRIC=MAX ...]
+#
+# Prints JSON. With --budget, exits 1 if any metric is above its maximum,
+# e.g. --budget track_change_p99_ms=100 --budget refresh_latency_p99_ms=17
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import obsstub
+from aiohttp import web
+from fakeplayer import private_bus, start_player
+
+TEXT = "text"
+THUMB = "thumb"
+
+
+def summarize(name: str, samples: list[float]) -> dict[str, float]:
+    samples = sorted(samples)
+    return {
+        f"{name}_mean_ms": statistics.fmean(samples),
+        f"{name}_p50_ms": samples[len(samples) // 2],
+        f"{name}_p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+class PlayerThread:
+    """Fake player and art server on their own loop, like a separate process"""
+
+    def __init__(self, artdir: str):
+        self.artdir = artdir
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="fake_player", daemon=True)
+        self.thread.start()
+        self.bus, self.player = self.call(start_player("harness"))
+        self.port = self.call(self.serve_art())
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(10)
+
+    def run(self, func, *args, **kwargs):
+        async def wrapper():
+            return func(*args, **kwargs)
+        return self.call(wrapper())
+
+    async def serve_art(self) -> int:
+        app = web.Application()
+        app.router.add_static("/", self.artdir)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return self.runner.addresses[0][1]
+
+    def close(self):
+        self.call(self.runner.cleanup())
+        self.bus.disconnect()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def measure_track_changes(smcinfo, player: PlayerThread, changes: int) -> dict[str, float]:
+    calls = 0
+    call = smcinfo.bus.call
+
+    async def counting_call(msg):
+        nonlocal calls
+        calls += 1
+        return await call(msg)
+
+    smcinfo.bus.call = counting_call
+    runs = sum(p.coalescer.runs for p in smcinfo.players.values())
+    samples = []
+    try:
+        for i in range(changes):
+            obsstub.reset()
+            title = f"Track {i}"
+            start = time.perf_counter()
+            player.run(player.player.set_track, f"Artist {i}", title)
+            update = obsstub.wait_for(lambda u: u.source == TEXT and title in u.settings.get("text", ""))
+            if update is None:
+                raise TimeoutError(f"text never showed {title!r}")
+            samples.append((update.time - start) * 1000)
+            time.sleep(0.05) # let trailing events settle
+    finally:
+        smcinfo.bus.call = call
+    runs = sum(p.coalescer.runs for p in smcinfo.players.values()) - runs
+    return {
+        **summarize("track_change", samples),
+        "updates_per_track_change": runs / changes,
+        "bus_calls_per_track_change": calls / changes,
+    }
+
+
+def measure_art_changes(player: PlayerThread, changes: int, scheme: str) -> dict[str, float]:
+    samples = []
+    for i in range(changes):
+        name = f"{scheme}-{i}.png"
+        with open(os.path.join(player.artdir, name), "wb") as f:
+            f.write(os.urandom(64 * 1024))
+        if scheme == "file":
+            url = "file://" + os.path.join(player.artdir, name)
+        else:
+            url = f"http://127.0.0.1:{player.port}/{name}"
+        obsstub.reset()
+        start = time.perf_counter()
+        player.run(player.player.set_track, "Art", f"{scheme} {i}", art_url=url)
+        update = obsstub.wait_for(lambda u: u.source == THUMB and u.settings.get("file"))
+        if update is None:
+            raise TimeoutError(f"thumbnail never showed {url}")
+        samples.append((update.time - start) * 1000)
+        time.sleep(0.05)
+    return summarize(f"art_{scheme}", samples)
+
+
+def refresh_latency(smcinfo) -> dict[str, float]:
+    # the default text shows the rounded position, which flips at every x.5 s;
+    # how long after that moment did each refresh reach obs_source_update
+    data = smcinfo.lastData
+    offset = time.time() - time.perf_counter()
+    samples = []
+    for update in obsstub.updates:
+        if update.source != TEXT:
+            continue
+        elapsed = update.time + offset - data.last_updated_time.timestamp()
+        pos = data.position.total_seconds() + elapsed * data.playback_rate
+        samples.append((pos - 0.5) % 1.0 / data.playback_rate * 1000)
+    if not samples:
+        raise TimeoutError("no position refresh while playing")
+    return {**summarize("refresh_latency", samples), "refreshes": len(samples)}
+
+
+def measure_idle_cpu(seconds: float) -> float:
+    cpu = time.process_time()
+    time.sleep(seconds)
+    return (time.process_time() - cpu) / seconds * 60
+
+
+def run(args) -> dict:
+    obsstub.install()
+    import smcinfo
+
+    obsstub.sources.update({TEXT, THUMB})
+    obsstub.script_ticks.append(smcinfo.script_tick)
+    settings = obsstub.obs_data_create()
+    smcinfo.script_defaults(settings)
+    obsstub.obs_data_set_string(settings, "source_name", TEXT)
+    obsstub.obs_data_set_string(settings, "thumbsource_name", THUMB)
+    obsstub.obs_data_set_string(settings, "log_level", "WARNING")
+
+    artdir = tempfile.mkdtemp(prefix="smcinfo_harness_")
+    player = PlayerThread(artdir)
+    stop = threading.Event()
+    ticker = threading.Thread(target=obsstub.run_timers, args=(stop,), name="obs_tick", daemon=True)
+    results: dict = {"changes": args.changes, "idle_seconds": args.idle}
+    try:
+        smcinfo.script_load(settings)
+        smcinfo.script_update(settings)
+        ticker.start()
+        if not obsstub.wait_for(lambda u: u.source == TEXT, timeout=10):
+            raise TimeoutError("no initial text update")
+
+        results.update(measure_track_changes(smcinfo, player, args.changes))
+        results.update(measure_art_changes(player, args.changes, "file"))
+        results.update(measure_art_changes(player, args.changes, "http"))
+
+        obsstub.reset()
+        results["cpu_s_per_idle_minute_playing"] = measure_idle_cpu(args.idle)
+        results.update(refresh_latency(smcinfo))
+        player.run(player.player.set_status, "Paused")
+        time.sleep(0.5)
+        results["cpu_s_per_idle_minute_paused"] = measure_idle_cpu(args.idle)
+        results["metrics"] = smcinfo.metrics.snapshot()
+    finally:
+        smcinfo.script_unload()
+        stop.set()
+        player.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--changes", type=int, default=20)
+    parser.add_argument("--idle", type=float, default=10, help="seconds per idle CPU sample")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--budget", action="append", default=[], metavar="METRIC=MAX")
+    args = parser.parse_args()
+
+    with private_bus():
+        results = run(args)
+
+    failed = []
+    for budget in args.budget:
+        metric, _, limit = budget.partition("=")
+        if metric not in results:
+            parser.error(f"unknown metric {metric!r}")
+        if results[metric] > float(limit):
+            failed.append(metric)
+    results["failed"] = failed
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# In-process stand-in for the obspython module, enough to load smcinfo.py
+# and now_playing.py outside OBS. Source updates are recorded with
+# timestamps; timers and script_tick are driven by a background thread, like
+# the OBS frame tick would.
+
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+OBS_COMBO_TYPE_EDITABLE = 1
+OBS_COMBO_TYPE_LIST = 2
+OBS_COMBO_FORMAT_STRING = 3
+OBS_TEXT_DEFAULT = 0
+OBS_TEXT_MULTILINE = 2
+OBS_PATH_FILE_SAVE = 1
+OBS_PATH_DIRECTORY = 2
+
+
+@dataclass
+class SourceUpdate:
+    time: float # time.perf_counter()
+    thread: str
+    source: str
+    settings: dict[str, Any]
+
+
+@dataclass
+class Data:
+    values: dict[str, Any] = field(default_factory=dict)
+    defaults: dict[str, Any] = field(default_factory=dict)
+
+    def get(self, key: str, fallback: Any) -> Any:
+        return self.values.get(key, self.defaults.get(key, fallback))
+
+
+updates: list[SourceUpdate] = []
+updated = threading.Condition()
+sources: set[str] = set()
+timers: dict[Callable, float] = {}
+timers_lock = threading.Lock()
+# script_tick functions, called once per frame
+script_ticks: list[Callable[[float], None]] = []
+FRAME = 1 / 60 # s
+
+
+def reset():
+    with updated:
+        updates.clear()
+
+
+def wait_for(pred: Callable[[SourceUpdate], bool], timeout: float = 5) -> SourceUpdate | None:
+    """First update since the last reset() matching pred, waiting for it if needed"""
+    deadline = time.perf_counter() + timeout
+    seen = 0
+    with updated:
+        while True:
+            for update in updates[seen:]:
+                if pred(update):
+                    return update
+            seen = len(updates)
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not updated.wait(remaining):
+                return None
+
+
+def run_timers(stop: threading.Event):
+    """Call registered timers at their intervals and script_ticks every frame until stop is set"""
+    due: dict[Callable, float] = {}
+    frame = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        with timers_lock:
+            active = list(timers.items())
+        for callback, interval in active:
+            if now >= due.setdefault(callback, now + interval):
+                due[callback] = now + interval
+                callback()
+        if now >= frame:
+            for tick in script_ticks:
+                tick(FRAME)
+            frame = max(frame + FRAME, now)
+        wakeup = min((due[callback] for callback, _ in active), default=now + 0.1)
+        if script_ticks:
+            wakeup = min(wakeup, frame)
+        if stop.wait(max(0.0, wakeup - time.perf_counter())):
+            return
+
+
+# obspython API
+
+
+def obs_data_create() -> Data:
+    return Data()
+
+
+def obs_data_release(data: Data):
+    pass
+
+
+def obs_data_set_string(data: Data, key: str, value: str):
+    data.values[key] = value
+
+
+obs_data_set_int = obs_data_set_bool = obs_data_set_string
+
+
+def obs_data_set_default_string(data: Data, key: str, value: Any):
+    data.defaults[key] = value
+
+
+obs_data_set_default_int = obs_data_set_default_bool = obs_data_set_default_string
+
+
+def obs_data_get_string(data: Data, key: str) -> str:
+    return data.get(key, "")
+
+
+def obs_data_get_int(data: Data, key: str) -> int:
+    return data.get(key, 0)
+
+
+def obs_data_get_bool(data: Data, key: str) -> bool:
+    return data.get(key, False)
+
+
+def obs_get_source_by_name(name: str) -> str | None:
+    return name if name in sources else None
+
+
+def obs_source_release(source: str | None):
+    pass
+
+
+def obs_source_update(source: str | None, settings: Data):
+    if source is None:
+        return
+    with updated:
+        updates.append(SourceUpdate(
+            time.perf_counter(), threading.current_thread().name, source, dict(settings.values)
+        ))
+        updated.notify_all()
+
+
+def timer_add(callback: Callable, ms: int):
+    with timers_lock:
+        timers[callback] = ms / 1000
+
+
+def timer_remove(callback: Callable):
+    with timers_lock:
+        timers.pop(callback, None)
+
+
+def install():
+    """Register this module as obspython"""
+    sys.modules["obspython"] = sys.modules[__name__]
+
+
+def __getattr__(name: str):
+    # property/UI calls are irrelevant headless
+    if name.startswith(("obs_properties_", "obs_property_")):
+        return lambda *args, **kwargs: None
+    if name == "obs_enum_sources":
+        return lambda: []
+    if name == "source_list_release":
+        return lambda sources: None
+    raise AttributeError(name)
+
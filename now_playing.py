@@ -31,10 +31,13 @@ def script_description():
         <hr/>
         """
 
+import abc
 import asyncio
 import ctypes
 import ctypes.wintypes
+import functools
 import logging
+import re
 import site
 import sys
 import threading
@@ -46,34 +49,68 @@ from itertools import chain
 from types import LambdaType
 from typing import Any, AnyStr, Callable, Sequence
 
-import win32api
-import win32con
-import win32gui
-import win32process
-import winrt.windows.foundation as _
-from winrt.windows.media.control import \
-    GlobalSystemMediaTransportControlsSessionManager as SMTCManager
-from winrt.windows.media.control import \
-    GlobalSystemMediaTransportControlsSessionMediaProperties as SMTCProperties
+if sys.platform == 'win32':
+    # the title parser below is pure Python and also loads elsewhere, for tests and benchmarks
+    import win32api
+    import win32con
+    import win32gui
+    import win32process
+    import winrt.windows.foundation as _
+    from winrt.windows.media.control import \
+        GlobalSystemMediaTransportControlsSessionManager as SMTCManager
+    from winrt.windows.media.control import \
+        GlobalSystemMediaTransportControlsSessionMediaProperties as SMTCProperties
 
 import obspython as obs
 
-def timeit(func):
-    async def process(func, *args, **params):
-        if asyncio.iscoroutinefunction(func):
-            return await func(*args, **params)
-        else:
-            return func(*args, **params)
-
-    async def helper(*args, **params):
-        start = time.time()
-        result = await process(func, *args, **params)
-        end = time.time()
-
-        log.debug(f'{func.__name__} takes {end - start}s')
-        return result
-
-    return helper
+class Metrics:
+    """Count, total and worst time per hot path, logged on unload
+
+    Deliberately small: the registry with histograms, counters and Prometheus
+    output is in smcinfo.py, this script only needs a summary.
+    """
+    def __init__(self):
+        # name -> [count, sum ms, max ms]
+        self.timings: dict[str, list[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, ms: float):
+        with self.lock:
+            timing = self.timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += ms
+            timing[2] = max(timing[2], ms)
+
+    def timed(self, name: str):
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.observe(name, (time.perf_counter() - start) * 1000)
+            else:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        self.observe(name, (time.perf_counter() - start) * 1000)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self.lock:
+            return {
+                name: {"count": count, "mean_ms": total / count, "max_ms": worst}
+                for name, (count, total, worst) in self.timings.items()
+            }
+
+
+metrics = Metrics()
 
 def IsWindowVisibleOnScreen(hwnd):
     def IsWindowCloaked(hwnd):
@@ -88,6 +125,8 @@ enabled = False
 check_frequency = 1000  # ms
 display_text = ''
 source_name = ''
+title_rules = ''
+capture_order = ''
 encaptureSet: set[str] = set()
 
 logging.basicConfig(
@@ -116,44 +155,247 @@ class Capture(object):
     def __call__(self, *args, **kwargs):
         return self._func(*args, **kwargs)
 
-def win32TitleCaptureWrapper(process: str):
-    def wrapper(func: Callable):
-        def wrapped() -> list[dict[str, Any]]:
-            def enumHandler(hwnd, result: list[dict[str, Any]]):
-                _, procpid = win32process.GetWindowThreadProcessId(hwnd)
-                try:
-                    if not IsWindowVisibleOnScreen(hwnd):
-                        return
-                    mypyproc = win32api.OpenProcess(
-                        win32con.PROCESS_QUERY_INFORMATION, False, procpid)
-                    image: str = win32process.GetModuleFileNameEx(mypyproc, 0)
-                    title: str = win32gui.GetWindowText(hwnd)
-                    
-                    if image.split('\\')[-1] == process:
-                        result.extend(func(title))
-                except Exception:
-                    log.warning(f'enumHandler error for {process}', exc_info=True)
+class TitleRule(object):
+    """How to read artist and title out of a window title
+
+    Either a template such as ``{artist} - {title} - VLC media player``, where
+    each ``{field}`` takes as little as possible and the rest must match
+    literally, or a regular expression with named groups written as ``/.../``.
+    """
+    FIELD = re.compile(r'\{(\w+)\}')
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        if len(pattern) > 1 and pattern.startswith('/') and pattern.endswith('/'):
+            self.regex = re.compile(pattern[1:-1])
+        else:
+            parts = self.FIELD.split(pattern)
+            # odd parts are field names
+            self.regex = re.compile(''.join(
+                f'(?P<{part}>.+?)' if i % 2 else re.escape(part)
+                for i, part in enumerate(parts)
+            ) + '$')
+
+    def match(self, title: str) -> dict[str, str] | None:
+        # artist and title are always there, '' when the rule does not capture them
+        m = self.regex.match(title)
+        if not m:
+            return None
+        fields = {'artist': '', 'title': ''}
+        fields.update((k, v.strip()) for k, v in m.groupdict().items() if v is not None)
+        return fields
+
+    def __repr__(self):
+        return f'TitleRule({self.pattern!r})'
+
+
+# tried in order, first match wins
+TITLE_RULES: dict[str, list[TitleRule]] = {
+    'spotify': [TitleRule('{artist} - {title}')],
+    'vlc': [TitleRule('{artist} - {title} - VLC media player')],
+    'yt_firefox': [TitleRule(r'/(?:\(\d+\) )?(?P<artist>.+?) - (?P<title>.+) - YouTube\b/')],
+    'yt_chrome': [TitleRule(r'/(?:\(\d+\) )?(?P<artist>.+?) - (?P<title>.+) - YouTube\b/')],
+    'foobar2000': [
+        TitleRule(r'/(?P<artist>.+?) - (?:\[[^\]]*\] )?(?P<title>.+?)\s+\[foobar2000\]$/'),
+        TitleRule(r'/(?P<title>.+?)\s+\[foobar2000\]$/'),
+    ],
+    'necloud': [TitleRule('{title} - {artist}')],
+    'aimp': [TitleRule('{artist} - {title}')],
+}
+# from the title_rules setting, tried before TITLE_RULES
+userTitleRules: dict[str, list[TitleRule]] = {}
+
+
+def parse_title_rules(text: str) -> dict[str, list[TitleRule]]:
+    """``player = pattern`` per line, player is a capture id or an image name like foo.exe"""
+    rules: dict[str, list[TitleRule]] = {}
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        player, sep, pattern = line.partition('=')
+        if not sep or not player.strip() or not pattern.strip():
+            log.warning(f'title rule {lineno}: expected "player = pattern": {line!r}')
+            continue
+        try:
+            rule = TitleRule(pattern.strip())
+        except re.error as err:
+            log.warning(f'title rule {lineno}: bad pattern {pattern.strip()!r}: {err}')
+            continue
+        rules.setdefault(player.strip().lower(), []).append(rule)
+    return rules
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_title(player: str, title: str) -> tuple[tuple[str, str], ...] | None:
+    # memoized, window titles rarely change between ticks
+    for rule in chain(userTitleRules.get(player, ()), TITLE_RULES.get(player, ())):
+        if (fields := rule.match(title)) is not None:
+            return tuple(fields.items())
+    return None
+
+
+def set_title_rules(text: str):
+    global userTitleRules
+    userTitleRules = parse_title_rules(text)
+    parse_title.cache_clear()
+
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+Window = namedtuple('Window', ['pid', 'image', 'title'])
+
+
+class WindowProvider(abc.ABC):
+    """Visible top-level windows with the image name of their process
+
+    Subclasses enumerate windows and look up processes; image names are cached
+    per PID. A cached PID is only revalidated against its process start time
+    (a reused PID) when the titles of its windows changed, and every
+    REVALIDATE_EVERY calls regardless.
+    """
+    REVALIDATE_EVERY = 60 # calls
+
+    def __init__(self):
+        self._images: dict[int, tuple[Any, str | None]] = {}
+        # pid -> titles of its windows on the last call
+        self._titles: dict[int, tuple[str, ...]] = {}
+        self._calls = 0
+
+    @abc.abstractmethod
+    def enumerate(self) -> list[tuple[int, str]]:
+        """(pid, title) of every visible window"""
+
+    @abc.abstractmethod
+    def start_time(self, pid: int) -> Any:
+        """Creation time of the process, opens it"""
+
+    @abc.abstractmethod
+    def image_name(self, pid: int) -> str | None:
+        """Executable file name of the process, lowercase, None if unavailable"""
+
+    def image(self, pid: int) -> str | None:
+        try:
+            started = self.start_time(pid)
+        except Exception:
+            log.debug(f'start time of {pid} unavailable', exc_info=True)
+            self._images[pid] = (None, None)
+            return None
+        cached = self._images.get(pid)
+        if cached and cached[0] == started:
+            return cached[1]
+        try:
+            image = self.image_name(pid)
+        except Exception:
+            log.debug(f'image of {pid} unavailable', exc_info=True)
+            image = None
+        self._images[pid] = (started, image)
+        return image
+
+    def windows(self) -> list[Window]:
+        self._calls += 1
+        revalidate = self._calls % self.REVALIDATE_EVERY == 0
+        windows = self.enumerate()
+        titles: dict[int, list[str]] = {}
+        for pid, title in windows:
+            titles.setdefault(pid, []).append(title)
+        images: dict[int, str | None] = {}
+        for pid, pidtitles in titles.items():
+            current = tuple(pidtitles)
+            if not revalidate and pid in self._images and self._titles.get(pid) == current:
+                images[pid] = self._images[pid][1]
+            else:
+                images[pid] = self.image(pid)
+            self._titles[pid] = current
+        # forget exited processes
+        for pid in self._titles.keys() - titles.keys():
+            del self._titles[pid]
+            self._images.pop(pid, None)
+        return [Window(pid, images[pid], title) for pid, title in windows if images[pid]]
+
+
+class Win32WindowProvider(WindowProvider):
+    def enumerate(self) -> list[tuple[int, str]]:
+        def enumHandler(hwnd, result: list[tuple[int, str]]):
+            try:
+                if not IsWindowVisibleOnScreen(hwnd):
                     return
-                return
-            result: list[dict[str, Any]] = []
-            win32gui.EnumWindows(enumHandler, result)
-            return result
-        return wrapped
-    return wrapper
-
-def foobar2000capture(title: str) -> tuple[str, str]:
-    artist = ''
-    song = ''
-    if ("-" not in title) and (title.find('[foobar2000]') != -1):
-        song = title[:title.rfind(" [foobar2000]")-1]
-    elif "-" in title:
-        artist = title[0:title.find("-")-1]
-        song = title[title.find("]")+2:title.rfind(" [foobar2000]")-1]
-    return (artist, song)
-
-manager: SMTCManager | None = None
-
-@timeit
+                _, pid = win32process.GetWindowThreadProcessId(hwnd)
+                result.append((pid, win32gui.GetWindowText(hwnd)))
+            except Exception:
+                log.warning('enumHandler error', exc_info=True)
+        result: list[tuple[int, str]] = []
+        win32gui.EnumWindows(enumHandler, result)
+        return result
+
+    def start_time(self, pid: int) -> Any:
+        handle = win32api.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        try:
+            return win32process.GetProcessTimes(handle)['CreationTime']
+        finally:
+            win32api.CloseHandle(handle)
+
+    def image_name(self, pid: int) -> str | None:
+        handle = win32api.OpenProcess(win32con.PROCESS_QUERY_INFORMATION, False, pid)
+        try:
+            return win32process.GetModuleFileNameEx(handle, 0).split('\\')[-1].lower()
+        finally:
+            win32api.CloseHandle(handle)
+
+
+class SyntheticWindowProvider(WindowProvider):
+    """Fixed window list, for benchmarks and tests on any OS"""
+    def __init__(self, windows: list[tuple[int, str, str]]):
+        super().__init__()
+        self.set_windows(windows)
+        self.lookups = 0
+        # start_time and image_name calls, each an OpenProcess on Win32
+        self.opens = 0
+
+    def set_windows(self, windows: list[tuple[int, str, str]]):
+        """(pid, image, title); a pid listed with a different image counts as restarted"""
+        self._windows = windows
+        self._processes = {pid: image.lower() for pid, image, _ in windows}
+
+    def enumerate(self) -> list[tuple[int, str]]:
+        return [(pid, title) for pid, _, title in self._windows]
+
+    def start_time(self, pid: int) -> Any:
+        self.opens += 1
+        return self._processes[pid]
+
+    def image_name(self, pid: int) -> str | None:
+        self.lookups += 1
+        self.opens += 1
+        return self._processes[pid]
+
+
+windowProvider: WindowProvider | None = Win32WindowProvider() if sys.platform == 'win32' else None
+
+
+def captureWindowTitles(players: dict[str, list[str]], windows: list[Window] | None = None) -> list[dict[str, Any]]:
+    """One enumeration for all title captures, players maps image name to capture ids"""
+    if windows is None:
+        windows = windowProvider.windows() if windowProvider else []
+    result: list[dict[str, Any]] = []
+    for window in windows:
+        for player in players.get(window.image, ()):
+            if fields := parse_title(player, window.title):
+                result.append(dict(fields))
+    return result
+
+
+class TitleCapture(Capture):
+    def __init__(self, id: str, display_name: str, image: str):
+        super().__init__(id, display_name, lambda: captureWindowTitles({self.image: [id]}))
+        self._image = image.lower()
+
+    @property
+    def image(self):
+        return self._image
+
+manager: 'SMTCManager | None' = None
+
+@metrics.timed("capture")
 async def smtcCaptureAsync() -> list[dict[str, Any]]:
     global manager
     if not manager:
@@ -176,14 +418,63 @@ def smtcCapture() -> list[dict[str, Any]]:
 
 captures: dict[str, Capture] = {
     'smtc': Capture('smtc', 'SMTC', smtcCapture),
-    'spotify': Capture('spotify', 'Spotify', win32TitleCaptureWrapper('spotify.exe')(lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:]}] if '-' in x else [])),
-    'vlc': Capture('vlc', "VLC", win32TitleCaptureWrapper('vlc.exe')(lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:x.rfind('-')-1]}] if '-' in x else [])),
-    'yt_firefox': Capture('yt_firefox', "YouTube for Firefox", win32TitleCaptureWrapper('firefox.exe')(lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:x.rfind('-')-1]}] if '- YouTube' in x else [])),
-    'yt_chrome': Capture('yt_chrome', 'YouTube for Chrome', win32TitleCaptureWrapper('chrome.exe')(lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:x.rfind('-')-1]}] if '- YouTube' in x else [])),
-    'foobar2000': Capture('foobar2000', 'foobar2000', win32TitleCaptureWrapper('foobar2000.exe')(foobar2000capture)),
-    'necloud': Capture('necloud', 'necloud', win32TitleCaptureWrapper('cloudmusic.exe')(lambda x: [{'artist': x[x.find("-")+2:], 'title': x[0:x.find("-")-1]}] if '-' in x else [])),
-    'aimp': Capture('aimp', 'AIMP', win32TitleCaptureWrapper('aimp.exe')(lambda x: [{'artist': x[0:x.find('-')-1], 'title': x[x.find('-')+2:]}] if '-' in x else [])),
+    'spotify': TitleCapture('spotify', 'Spotify', 'spotify.exe'),
+    'vlc': TitleCapture('vlc', "VLC", 'vlc.exe'),
+    'yt_firefox': TitleCapture('yt_firefox', "YouTube for Firefox", 'firefox.exe'),
+    'yt_chrome': TitleCapture('yt_chrome', 'YouTube for Chrome', 'chrome.exe'),
+    'foobar2000': TitleCapture('foobar2000', 'foobar2000', 'foobar2000.exe'),
+    'necloud': TitleCapture('necloud', 'necloud', 'cloudmusic.exe'),
+    'aimp': TitleCapture('aimp', 'AIMP', 'aimp.exe'),
 }
+# captures for images named in the title_rules setting, always enabled
+userCaptures: dict[str, Capture] = {}
+
+
+class CaptureStats(object):
+    """Cost and hit history of one capture, to back off expensive sources that keep missing"""
+    COST_ALPHA = 0.2
+    CHEAP_MS = 1.0 # always probed
+    MAX_BACKOFF = 8 # ticks
+
+    __slots__ = ('cost', 'misses', 'next_probe')
+
+    def __init__(self):
+        self.cost = 0.0 # ms, EWMA
+        self.misses = 0
+        self.next_probe = 0 # tick
+
+    def due(self, tick: int) -> bool:
+        return tick >= self.next_probe
+
+    def record(self, tick: int, ms: float, hit: bool):
+        self.cost = ms if not self.cost else self.cost + self.COST_ALPHA * (ms - self.cost)
+        if hit:
+            self.misses = 0
+            self.next_probe = tick + 1
+            return
+        self.misses += 1
+        if self.cost < self.CHEAP_MS:
+            self.next_probe = tick + 1
+        else:
+            # 1, 2, 4, ... ticks, probing a miss gets cheaper the longer it keeps missing
+            self.next_probe = tick + min(2 ** (self.misses - 1), self.MAX_BACKOFF)
+
+
+captureStats: dict[str, CaptureStats] = {}
+# enabled captures, highest priority first
+captureOrder: list[Capture] = []
+tick = 0
+
+
+def orderCaptures(order: str) -> list[Capture]:
+    """Enabled captures in the order named by the capture_order setting, then the rest as listed"""
+    available = {**{name: captures[name] for name in captures if name in encaptureSet}, **userCaptures}
+    names = [name.strip().lower() for name in order.split(',') if name.strip()]
+    for name in names:
+        if name not in captures and name not in userCaptures:
+            log.warning(f'capture_order: unknown capture {name!r}')
+    ordered = [available[name] for name in dict.fromkeys(names) if name in available]
+    return ordered + [cap for name, cap in available.items() if name not in names]
 
 
 def script_properties():
@@ -201,6 +492,17 @@ def script_properties():
         props, "display_text", "Display text", obs.OBS_TEXT_DEFAULT)
     for name, cap in captures.items():
         obs.obs_properties_add_bool(props, name, cap.display_name)
+    order = obs.obs_properties_add_text(
+        props, "capture_order", "Capture order", obs.OBS_TEXT_DEFAULT)
+    obs.obs_property_set_long_description(
+        order, "Comma separated capture ids, highest priority first. "
+        "A capture only runs when the ones before it found nothing; unlisted ones run last.")
+    rules = obs.obs_properties_add_text(
+        props, "title_rules", "Title rules", obs.OBS_TEXT_MULTILINE)
+    obs.obs_property_set_long_description(
+        rules, "One rule per line: player = pattern, e.g. vlc = {artist} - {title} - VLC media player. "
+        "player is a capture above or an image name such as musicbee.exe, "
+        "pattern a template with {artist} and {title} or a /regex/ with named groups.")
 
     p = obs.obs_properties_add_list(
         props, "source_name", "Text source",
@@ -225,6 +527,8 @@ def script_defaults(settings):
     obs.obs_data_set_default_string(settings, "display_text", "%artist - %title")
     obs.obs_data_set_default_string(settings, "source_name", '')
     obs.obs_data_set_default_string(settings, "log_level", 'INFO')
+    obs.obs_data_set_default_string(settings, "title_rules", '')
+    obs.obs_data_set_default_string(settings, "capture_order", ', '.join(captures))
     for name in captures.keys():
         obs.obs_data_set_default_bool(settings, name, name == 'smtc')
 
@@ -238,6 +542,9 @@ def script_update(settings):
     global display_text
     global check_frequency
     global source_name
+    global title_rules
+    global capture_order
+    global captureOrder
     log.debug(f"script_update({settings!r})")
 
     loglevel = obs.obs_data_get_string(settings, "log_level")
@@ -258,6 +565,18 @@ def script_update(settings):
     for name in captures.keys():
         if obs.obs_data_get_bool(settings, name):
             encaptureSet.add(name)
+
+    new_title_rules = obs.obs_data_get_string(settings, "title_rules")
+    if new_title_rules != title_rules:
+        title_rules = new_title_rules
+        set_title_rules(title_rules)
+        userCaptures.clear()
+        for player in userTitleRules:
+            if player not in captures:
+                userCaptures[player] = TitleCapture(player, player, player)
+    capture_order = obs.obs_data_get_string(settings, "capture_order")
+    captureOrder = orderCaptures(capture_order)
+    log.debug(f"capture order: {[cap.id for cap in captureOrder]}")
     
     if new_check_frequency != check_frequency and enabled:
         check_frequency = new_check_frequency
@@ -275,6 +594,7 @@ def script_update(settings):
             enabled = False
             obs.timer_remove(onUpdate)
 
+@metrics.timed("obs_source_update")
 def update_song(data: dict[str, Any]):
     now_playing = display_text
     for key, value in data.items():
@@ -312,6 +632,7 @@ def script_load(_):
 def script_unload():
     log.debug('script_unload()')
     obs.timer_remove(onUpdate)
+    log.debug(f'metrics: {metrics.snapshot()}')
     [task.cancel('plugin unloaded') for task in asyncio.all_tasks(loop)]
     loop.stop()
 
@@ -324,17 +645,40 @@ def onUpdate():
             return
     fut.add_done_callback(callback)
 
+@metrics.timed("update")
 async def doUpdate():
-    try:
-        datalist = await asyncio.gather(*[asyncio.to_thread(captures[name]) for name in encaptureSet ])
-        data: list[dict[str, Any]] = list(chain(*datalist))
-    except Exception:
-        log.warning('capture error', exc_info=True)
-        return
-    
-    log.debug(f"doUpdate: {data}")
-    if not data:
+    # highest priority first, stop at the first capture that finds something
+    global tick
+    tick += 1
+    windows: list[Window] | None = None
+    for cap in captureOrder:
+        stats = captureStats.setdefault(cap.id, CaptureStats())
+        if not stats.due(tick):
+            continue
+        try:
+            if isinstance(cap, TitleCapture) and windows is None:
+                # title captures share one window enumeration per tick; it is
+                # timed on its own so no capture's backoff pays for it
+                start = time.perf_counter()
+                windows = await asyncio.to_thread(windowProvider.windows) if windowProvider else []
+                metrics.observe('window_enumeration', (time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            if isinstance(cap, TitleCapture):
+                data = captureWindowTitles({cap.image: [cap.id]}, windows)
+            else:
+                data = await asyncio.to_thread(cap)
+        except Exception:
+            log.warning(f'{cap.id} capture error', exc_info=True)
+            data = []
+        ms = (time.perf_counter() - start) * 1000
+        stats.record(tick, ms, bool(data))
+        metrics.observe(f'capture_{cap.id}', ms)
+        if data:
+            break
+    else:
         return
+
+    log.debug(f"doUpdate: {cap.id} {data}")
     try:
         update_song(data[0])
     except Exception:
@@ -21,31 +21,48 @@ DEFAULT_DISPLAY_EXPR = r"""
 ])
 """.strip()
 
+DEFAULT_DISPLAY_TEMPLATE = "{!data}NO MEDIA{/}{?data}{artist} - {title} {?pos}\n{pos}/{end_time}{/}{/}"
+
+import ast
 import asyncio
-import aiohttp
+import bisect
+import builtins
 import concurrent.futures
+import functools
+import hashlib
+import io
+import json
 import logging
+import math
 import os
 import shutil
+import signal
+import struct
 import sys
 import tempfile
 import threading
 import time
 import traceback
-from collections.abc import Coroutine
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine, Mapping
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields, replace
 from datetime import datetime, timedelta, timezone
-from types import CodeType
-from typing import Any, cast
+from typing import TYPE_CHECKING, Any, cast, get_args, get_origin
 import platform
+import re
 import urllib.parse
 
 MEDIACTRL = {'Windows': 'SMTC', 'Linux': 'MPRIS',}.get(platform.system())
 
-if MEDIACTRL == 'SMTC':
-    import winrt.windows.foundation as _
+# the backends and aiohttp load on first use: OBS imports every script at startup
+if TYPE_CHECKING:
+    import aiohttp
+    from aiohttp import web
+    from dbus_next import introspection as intr
+    from dbus_next.aio.message_bus import MessageBus
+    from dbus_next.message import Message
     from winrt.windows.foundation import EventRegistrationToken
-    from winrt.windows.foundation.collections import IVectorView as _
     from winrt.windows.media.control import CurrentSessionChangedEventArgs, SessionsChangedEventArgs
     from winrt.windows.media.control import \
         GlobalSystemMediaTransportControlsSession as SMTCSession
@@ -59,14 +76,12 @@ if MEDIACTRL == 'SMTC':
     from winrt.windows.media.control import GlobalSystemMediaTransportControlsSessionPlaybackInfo as PlaybackInfo
     from winrt.windows.media.control import (MediaPropertiesChangedEventArgs,
                                             TimelinePropertiesChangedEventArgs, PlaybackInfoChangedEventArgs)
-    from winrt.windows.storage.streams import (DataReader,
-                                            IRandomAccessStreamReference)
-elif MEDIACTRL == 'MPRIS':
-    from dbus_next.aio.message_bus import MessageBus, ProxyObject
-    from dbus_next.message import Message
-    from dbus_next.constants import MessageType
+    from winrt.windows.storage.streams import IRandomAccessStreamReference
 
-import obspython as obs
+if __name__ == "__main__":
+    obs: Any = None # headless, see main()
+else:
+    import obspython as obs
 
 def convert_future_exc(exc):
     exc_class = type(exc)
@@ -79,22 +94,110 @@ def convert_future_exc(exc):
 
 asyncio.futures._convert_future_exc = convert_future_exc  # type: ignore
 
-def timeit(func):
-    async def process(func, *args, **params):
-        if asyncio.iscoroutinefunction(func):
-            return await func(*args, **params)
-        else:
-            return func(*args, **params)
-
-    async def helper(*args, **params):
-        start = time.time()
-        result = await process(func, *args, **params)
-        end = time.time()
-
-        log.debug(f"{func.__name__} takes {end - start}s")
-        return result
+class Histogram:
+    # fixed log-spaced buckets (ms): O(log n) to record, percentiles from counts
+    BOUNDS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect.bisect_left(self.BOUNDS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q: float) -> float:
+        # upper bound of the bucket holding the q-th sample
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.BOUNDS, self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, ms: float):
+        with self.lock:
+            if (hist := self.histograms.get(name)) is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(ms)
+
+    def timed(self, name: str):
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.observe(name, (time.perf_counter() - start) * 1000)
+            else:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        self.observe(name, (time.perf_counter() - start) * 1000)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {
+                    name: {
+                        "count": hist.count,
+                        "sum_ms": hist.sum,
+                        "max_ms": hist.max,
+                        "p50_ms": hist.percentile(0.5),
+                        "p90_ms": hist.percentile(0.9),
+                        "p99_ms": hist.percentile(0.99),
+                    }
+                    for name, hist in self.histograms.items()
+                },
+            }
 
-    return helper
+    def prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+                lines.append(f"{self.prefix}_{name}_total {value}")
+            for name, hist in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}_ms"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip(Histogram.BOUNDS, hist.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {hist.count}')
+                lines.append(f"{metric}_sum {hist.sum}")
+                lines.append(f"{metric}_count {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics("smcinfo")
 
 logging.basicConfig(
     format="[{asctime}] [{module}] [{threadName}/{levelname}]: [{funcName}]: {message}",
@@ -113,11 +216,29 @@ log.info(f'Using media control: {MEDIACTRL}')
 
 enabled = False
 update_frequency = 1000 # ms
-display_expr: CodeType | None = None
+display_mode = "expr" # or "template"
+display_expr: "DisplayExpr | DisplayTemplate | None" = None
 source_name = ""
 thumbsource_name = ""
 session_name = "<default>"
 session_name_list: list[str] = []
+debounce = 50 # ms
+thumb_size = 0 # px, 0 keeps the original
+metrics_path = ""
+thumbcache_persist = False
+thumbcache_size = 64 # MiB
+thumbcache_count = 256
+lyrics_dir = ""
+output_text_path = ""
+output_json_path = ""
+output_min_interval = 1000 # ms
+progress_source = ""
+progress_width = 400 # px
+progress_height = 8 # px
+progress_fg = 0xFFFFFFFF # ABGR, as OBS color properties
+progress_bg = 0x80000000
+serve_host = "127.0.0.1"
+serve_port = 0 # 0 = off
 
 media_props: dict[str, Any] = {}
 timeline_props: dict[str, Any] = {}
@@ -140,6 +261,20 @@ def script_properties():
     obs.obs_properties_add_text(
         props, "display_expr", "Display expr", obs.OBS_TEXT_MULTILINE
     )
+    modes = obs.obs_properties_add_list(
+        props, "display_mode", "Display mode", obs.OBS_COMBO_TYPE_LIST, obs.OBS_COMBO_FORMAT_STRING
+    )
+    obs.obs_property_list_add_string(modes, "Python expression", "expr")
+    obs.obs_property_list_add_string(modes, "Template", "template")
+    template = obs.obs_properties_add_text(
+        props, "display_template", "Display template", obs.OBS_TEXT_MULTILINE
+    )
+    obs.obs_property_set_long_description(
+        template,
+        "{field} or {field:format spec}; {?field}...{/} shows its content when field is set, "
+        "{!field}...{/} when it is not. {pos} is the predicted position, {lyric} and {next_lyric} "
+        "the synced lyrics, {?data} tells whether anything is playing. {{ and }} are literal braces."
+    )
 
     p = obs.obs_properties_add_list(
         props,
@@ -155,6 +290,17 @@ def script_properties():
         obs.OBS_COMBO_TYPE_EDITABLE,
         obs.OBS_COMBO_FORMAT_STRING,
     )
+    p4 = obs.obs_properties_add_list(
+        props,
+        "progress_source",
+        "Progress bar source",
+        obs.OBS_COMBO_TYPE_EDITABLE,
+        obs.OBS_COMBO_FORMAT_STRING,
+    )
+    obs.obs_properties_add_int(props, "progress_width", "Progress bar width (px)", 1, 8192, 1)
+    obs.obs_properties_add_int(props, "progress_height", "Progress bar height (px)", 1, 512, 1)
+    obs.obs_properties_add_color_alpha(props, "progress_fg", "Progress bar color")
+    obs.obs_properties_add_color_alpha(props, "progress_bg", "Progress bar background")
     p3 = obs.obs_properties_add_list(
         props,
         "session_name",
@@ -163,6 +309,26 @@ def script_properties():
         obs.OBS_COMBO_FORMAT_STRING
     )
 
+    obs.obs_properties_add_path(
+        props, "metrics_path", "Metrics file (Prometheus)", obs.OBS_PATH_FILE_SAVE, "*.prom", None
+    )
+    obs.obs_properties_add_path(
+        props, "lyrics_dir", "Lyrics directory (Artist - Title.lrc)", obs.OBS_PATH_DIRECTORY, None, None
+    )
+    obs.obs_properties_add_int(props, "debounce", "Event debounce (ms)", 0, 2000, 10)
+    obs.obs_properties_add_int(props, "thumb_size", "Thumbnail size (px, 0 = original)", 0, 4096, 1)
+    obs.obs_properties_add_bool(props, "thumbcache_persist", "Keep thumbnail cache across restarts")
+    obs.obs_properties_add_int(props, "thumbcache_size", "Thumbnail cache size (MiB)", 1, 4096, 1)
+    obs.obs_properties_add_int(props, "thumbcache_count", "Thumbnail cache entries", 1, 100000, 1)
+    obs.obs_properties_add_path(
+        props, "output_text_path", "Write text to file", obs.OBS_PATH_FILE_SAVE, "*.txt", None
+    )
+    obs.obs_properties_add_path(
+        props, "output_json_path", "Write snapshot JSON to file", obs.OBS_PATH_FILE_SAVE, "*.json", None
+    )
+    obs.obs_properties_add_int(props, "output_min_interval", "Minimum file write interval (ms)", 0, 60000, 100)
+    obs.obs_properties_add_int(props, "serve_port", "Serve snapshots on localhost port (0 = off)", 0, 65535, 1)
+
     obs.obs_property_list_add_string(p3, '<default>', '<default>')
 
     for name in session_name_list:
@@ -178,6 +344,7 @@ def script_properties():
             elif source_id == "image_source":
                 name = obs.obs_source_get_name(source)
                 obs.obs_property_list_add_string(p2, name, name)
+                obs.obs_property_list_add_string(p4, name, name)
     obs.source_list_release(sources)
 
     return props
@@ -188,10 +355,28 @@ def script_defaults(settings):
 
     obs.obs_data_set_default_bool(settings, "enabled", True)
     obs.obs_data_set_default_string(settings, "display_expr", DEFAULT_DISPLAY_EXPR)
+    obs.obs_data_set_default_string(settings, "display_mode", "expr")
+    obs.obs_data_set_default_string(settings, "display_template", DEFAULT_DISPLAY_TEMPLATE)
     obs.obs_data_set_default_string(settings, "source_name", "")
     obs.obs_data_set_default_string(settings, "thumbsource_name", "")
     obs.obs_data_set_default_string(settings, "log_level", "INFO")
     obs.obs_data_set_default_string(settings, "session_name", "<default>")
+    obs.obs_data_set_default_int(settings, "debounce", 50)
+    obs.obs_data_set_default_string(settings, "lyrics_dir", "")
+    obs.obs_data_set_default_string(settings, "metrics_path", "")
+    obs.obs_data_set_default_int(settings, "thumb_size", 0)
+    obs.obs_data_set_default_bool(settings, "thumbcache_persist", False)
+    obs.obs_data_set_default_int(settings, "thumbcache_size", 64)
+    obs.obs_data_set_default_int(settings, "thumbcache_count", 256)
+    obs.obs_data_set_default_string(settings, "output_text_path", "")
+    obs.obs_data_set_default_string(settings, "output_json_path", "")
+    obs.obs_data_set_default_int(settings, "output_min_interval", 1000)
+    obs.obs_data_set_default_string(settings, "progress_source", "")
+    obs.obs_data_set_default_int(settings, "progress_width", 400)
+    obs.obs_data_set_default_int(settings, "progress_height", 8)
+    obs.obs_data_set_default_int(settings, "progress_fg", 0xFFFFFFFF)
+    obs.obs_data_set_default_int(settings, "progress_bg", 0x80000000)
+    obs.obs_data_set_default_int(settings, "serve_port", 0)
 
 
 def script_save(settings):
@@ -201,60 +386,559 @@ def script_save(settings):
 
 
 
+# setting -> kind of its obs_data getter
+SETTINGS = {
+    "enabled": "bool",
+    "log_level": "string",
+    "display_mode": "string",
+    "display_expr": "string",
+    "display_template": "string",
+    "source_name": "string",
+    "thumbsource_name": "string",
+    "session_name": "string",
+    "debounce": "int",
+    "thumb_size": "int",
+    "metrics_path": "string",
+    "thumbcache_persist": "bool",
+    "thumbcache_size": "int",
+    "thumbcache_count": "int",
+    "lyrics_dir": "string",
+    "output_text_path": "string",
+    "output_json_path": "string",
+    "output_min_interval": "int",
+    "progress_source": "string",
+    "progress_width": "int",
+    "progress_height": "int",
+    "progress_fg": "int",
+    "progress_bg": "int",
+    "serve_port": "int",
+}
+SETTINGS_DEBOUNCE = 0.3 # s, OBS calls script_update on every keystroke
+appliedSettings: dict[str, Any] = {}
+pendingSettings: dict[str, Any] = {}
+settingsHandle: asyncio.TimerHandle | None = None
+
 def script_update(settings):
+    log.debug(f"script_update({settings!r})")
+    values = {
+        key: getattr(obs, f"obs_data_get_{kind}")(settings, key) for key, kind in SETTINGS.items()
+    }
+    loop.call_soon_threadsafe(queue_settings, values)
+
+def queue_settings(values: dict[str, Any]):
+    # on loop, the first settings apply at once, edits after a pause in typing
+    global pendingSettings
+    global settingsHandle
+    pendingSettings = values
+    if settingsHandle:
+        settingsHandle.cancel()
+    settingsHandle = loop.call_later(SETTINGS_DEBOUNCE if appliedSettings else 0, apply_settings)
+
+def apply_settings():
+    # only what changed since the last time is compiled, reconfigured or recaptured
     global enabled
+    global display_mode
     global display_expr
-    global check_frequency
     global source_name
     global thumbsource_name
     global session_name
-    log.debug(f"script_update({settings!r})")
+    global debounce
+    global thumb_size
+    global metrics_path
+    global thumbcache_persist
+    global thumbcache_size
+    global thumbcache_count
+    global lyrics_dir
+    global output_text_path
+    global output_json_path
+    global output_min_interval
+    global progress_source
+    global progress_width
+    global progress_height
+    global progress_fg
+    global progress_bg
+    global serve_port
+    global settingsHandle
+    settingsHandle = None
+    values = pendingSettings
+    changed = {key for key, value in values.items() if key not in appliedSettings or appliedSettings[key] != value}
+    appliedSettings.update(values)
+    if not changed:
+        return
+    log.debug(f"settings changed: {sorted(changed)}")
+
+    if "log_level" in changed:
+        loglevel = values["log_level"]
+        if loglevel == "SILENT":
+            logging.getLogger().setLevel(logging.CRITICAL + 100)
+        else:
+            try:
+                logging.getLogger().setLevel(loglevel)
+            except ValueError:
+                traceback.print_exc(file=sys.stderr)
+                logging.getLogger().setLevel(logging.INFO)
+
+    if changed & {"display_mode", "display_expr", "display_template"}:
+        display_mode = values["display_mode"]
+        try:
+            if display_mode == "template":
+                display_expr = DisplayTemplate(values["display_template"])
+            else:
+                display_expr = DisplayExpr(values["display_expr"])
+        except (SyntaxError, ValueError):
+            log.warning("Invalid display expression, keeping the previous one", exc_info=True)
+    source_name = values["source_name"]
+    thumbsource_name = values["thumbsource_name"]
+    session_name = values["session_name"]
+    debounce = values["debounce"]
+    thumb_size = values["thumb_size"]
+    metrics_path = values["metrics_path"]
+    thumbcache_persist = values["thumbcache_persist"]
+    thumbcache_size = values["thumbcache_size"]
+    thumbcache_count = values["thumbcache_count"]
+    if "lyrics_dir" in changed:
+        lyrics_dir = values["lyrics_dir"]
+        lyricsCache.clear()
+    output_text_path = values["output_text_path"]
+    output_json_path = values["output_json_path"]
+    output_min_interval = values["output_min_interval"]
+    progress_source = values["progress_source"]
+    progress_width = values["progress_width"]
+    progress_height = values["progress_height"]
+    progress_fg = values["progress_fg"]
+    progress_bg = values["progress_bg"]
+    if changed & {"thumbcache_persist", "thumbcache_size", "thumbcache_count"}:
+        configure_thumbcache()
+    if "serve_port" in changed:
+        serve_port = values["serve_port"]
+        submit(serially(functools.partial(serve, serve_port)))
+    if changed & {"progress_source", "progress_width", "progress_height", "progress_fg", "progress_bg"}:
+        progressBar.reconfigure()
+
+    if values["enabled"] and not enabled:
+        log.info('Initalizing media controls')
+        submit(serially(smcInitalizeAsync))
+    elif not values["enabled"] and enabled:
+        log.info('Deinitalizing media controls')
+        submit(serially(smcDeinitalizeAsync))
+        cancel_refresh()
+        progressBar.stop()
+    toggled = values["enabled"] != enabled
+    enabled = values["enabled"]
+    if not enabled or toggled:
+        return
+    if "session_name" in changed:
+        submit(serially(smcSelectSessionAsync))
+    if "thumb_size" in changed:
+        submit(serially(smcUpdateAsync))
+    elif changed & {"source_name", "thumbsource_name"}:
+        pushedValues.clear()
+        publish(lastData)
+        publish_art(lastArt)
+    elif changed & {"display_mode", "display_expr", "display_template", "lyrics_dir", "output_text_path", "output_json_path"}:
+        publish(lastData)
+
+###! <---
+###! THUMB
+###! --->
+
+thumbdir: str | None = None
+
+
+class ThumbnailCache:
+    INDEX = "index.json"
+
+    def __init__(self, directory: str, max_bytes: int, max_count: int, persist: bool):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.persist = persist
+        # sha256 -> size, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        # url -> [sha256, etag, last-modified, expires]
+        self._urls: dict[str, list[Any]] = {}
+        self._size = 0
+        # disk work of store() runs on tpool one job at a time, so a delete never overtakes a write
+        self._disk = asyncio.Lock()
+        os.makedirs(directory, exist_ok=True)
+        if persist:
+            self._load()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def _entry(self, url: str) -> list[Any] | None:
+        entry = self._urls.get(url)
+        if entry is None or entry[0] not in self._entries:
+            return None
+        if not os.path.exists(self.path(entry[0])):
+            self._drop(entry[0])
+            return None
+        return entry
+
+    def lookup(self, url: str) -> str | None:
+        entry = self._entry(url)
+        if entry is None or entry[3] <= time.time():
+            return None
+        self._entries.move_to_end(entry[0])
+        return self.path(entry[0])
+
+    def validators(self, url: str) -> dict[str, str]:
+        entry = self._entry(url)
+        headers = {}
+        if entry and entry[1]:
+            headers["If-None-Match"] = entry[1]
+        if entry and entry[2]:
+            headers["If-Modified-Since"] = entry[2]
+        return headers
+
+    def revalidated(self, url: str, max_age: float) -> str | None:
+        entry = self._entry(url)
+        if entry is None:
+            return None
+        entry[3] = time.time() + max_age
+        self._entries.move_to_end(entry[0])
+        return self.path(entry[0])
+
+    async def store(
+        self,
+        content: bytes,
+        url: str | None = None,
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        max_age: float = 0,
+    ) -> str:
+        # on loop, only the in-memory index is touched here
+        async with self._disk:
+            digest = await loop.run_in_executor(tpool, self._write, content)
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+            else:
+                self._entries[digest] = len(content)
+                self._size += len(content)
+            if url:
+                self._urls[url] = [digest, etag, last_modified, time.time() + max_age]
+            evicted = self.evict()
+            # a crash must not leave files the next session does not know about
+            index = self.index() if self.persist else None
+            await loop.run_in_executor(tpool, self._flush, evicted, index)
+        return self.path(digest)
+
+    def _write(self, content: bytes) -> str:
+        # runs on tpool
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            with open(path + ".part", "wb") as f:
+                f.write(content)
+            os.replace(path + ".part", path)
+        return digest
+
+    def _flush(self, evicted: list[str], index: str | None):
+        # runs on tpool
+        for digest in evicted:
+            try:
+                os.remove(self.path(digest))
+            except FileNotFoundError:
+                pass
+        if index is not None:
+            write_file_atomic(os.path.join(self.directory, self.INDEX), index)
+
+    def resize(self, max_bytes: int, max_count: int):
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self._flush(self.evict(), None)
+        self.save()
+
+    def evict(self) -> list[str]:
+        # never evict the most recent entry, it is the one being shown
+        evicted = []
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_count or self._size > self.max_bytes
+        ):
+            digest = next(iter(self._entries))
+            self._drop(digest)
+            evicted.append(digest)
+            log.debug(f"thumbcache evicted {digest}")
+        return evicted
+
+    def _drop(self, digest: str):
+        size = self._entries.pop(digest, None)
+        if size is None:
+            return
+        self._size -= size
+        self._urls = {u: e for u, e in self._urls.items() if e[0] != digest}
+
+    def _load(self):
+        index: dict[str, Any] = {}
+        try:
+            with open(os.path.join(self.directory, self.INDEX), encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            log.warning("Failed to load thumbnail cache index", exc_info=True)
+        indexed = dict(index.get("entries", []))
+        # files the index does not know about (a session that never saved) count
+        # against the budget too, as the least recently used; leftover .part go
+        orphans = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name == self.INDEX:
+                    continue
+                if entry.name.endswith(".part"):
+                    os.remove(entry.path)
+                elif entry.name not in indexed and re.fullmatch(r"[0-9a-f]{64}", entry.name):
+                    stat = entry.stat()
+                    orphans.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, digest, size in sorted(orphans):
+            self._entries[digest] = size
+            self._size += size
+        for digest, size in indexed.items():
+            if os.path.exists(self.path(digest)):
+                self._entries[digest] = size
+                self._size += size
+        self._urls = {
+            u: e for u, e in index.get("urls", {}).items()
+            if isinstance(e, list) and len(e) == 4 and e[0] in self._entries
+        }
+        self._flush(self.evict(), None)
+        self.save()
+        log.debug(
+            f"thumbcache loaded {len(self._entries)} entries ({len(orphans)} unindexed), {self._size} bytes"
+        )
 
-    loglevel = obs.obs_data_get_string(settings, "log_level")
-    if loglevel == "SILENT":
-        logging.getLogger().setLevel(logging.CRITICAL + 100)
+    def index(self) -> str:
+        return json.dumps({"entries": list(self._entries.items()), "urls": self._urls})
+
+    def save(self):
+        # blocking, for load, settings changes and unload
+        if self.persist:
+            write_file_atomic(os.path.join(self.directory, self.INDEX), self.index())
+
+
+thumbcache: ThumbnailCache | None = None
+
+
+def thumbcache_dir() -> str | None:
+    if not thumbcache_persist:
+        return os.path.join(thumbdir, "cache") if thumbdir else None
+    if MEDIACTRL == "SMTC":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
     else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "smcinfo", "thumbs")
+
+
+def configure_thumbcache():
+    global thumbcache
+    directory = thumbcache_dir()
+    max_bytes = thumbcache_size * 1024 * 1024
+    if thumbcache and thumbcache.directory == directory:
+        thumbcache.persist = thumbcache_persist
+        thumbcache.resize(max_bytes, thumbcache_count)
+        return
+    if thumbcache:
+        thumbcache.save()
+    thumbcache = None
+    if directory:
+        log.debug(f"thumbcache at {directory}")
+        thumbcache = ThumbnailCache(directory, max_bytes, thumbcache_count, thumbcache_persist)
+
+PILImage: Any = None
+ART_VARIANT_MAX_AGE = 365 * 24 * 60 * 60 # s, variants never go stale
+
+
+def read_art(path: str) -> tuple[bytes, str]:
+    # runs on tpool
+    with open(path, "rb") as f:
+        content = f.read()
+    return content, hashlib.sha256(content).hexdigest()
+
+
+def downscale_art(content: bytes, size: int) -> bytes | None:
+    # runs on tpool, None if the art is already small enough
+    with PILImage.open(io.BytesIO(content)) as img:
+        # before draft(), which already shrinks a JPEG towards size
+        if max(img.size) <= size:
+            return None
+        # lets JPEG decode straight at a reduced scale
+        img.draft("RGBA", (size, size))
+        img.thumbnail((size, size), PILImage.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "PNG")
+        return out.getvalue()
+
+
+async def process_art(path: str) -> str:
+    # decode and downscale off the loop, cached per (art hash, size)
+    global PILImage
+    if not path or not thumb_size or not thumbcache:
+        return path
+    if PILImage is None:
         try:
-            logging.getLogger().setLevel(loglevel)
-        except ValueError:
-            traceback.print_exc(file=sys.stderr)
-            logging.getLogger().setLevel(logging.INFO)
+            from PIL import Image as PILImage
+        except ImportError:
+            log.warning("Pillow is not installed, thumbnails are not resized")
+            PILImage = False
+    if not PILImage:
+        return path
+    try:
+        if os.path.dirname(path) == thumbcache.directory:
+            digest = os.path.basename(path)
+            content = None
+        else:
+            content, digest = await loop.run_in_executor(tpool, read_art, path)
+        key = f"art:{digest}@{thumb_size}"
+        if cached := thumbcache.lookup(key):
+            return cached
+        if content is None:
+            content, digest = await loop.run_in_executor(tpool, read_art, path)
+        start = time.perf_counter()
+        resized = await loop.run_in_executor(tpool, downscale_art, content, thumb_size)
+        elapsed = (time.perf_counter() - start) * 1000
+        metrics.observe("art_downscale", elapsed)
+        log.debug(f"art {digest} downscaled in {elapsed:.1f}ms")
+    except Exception:
+        log.warning(f"Failed to process art {path}", exc_info=True)
+        return path
+    if resized is None:
+        return path
+    return await thumbcache.store(resized, key, max_age=ART_VARIANT_MAX_AGE)
+
+
+stagedArt: OrderedDict[str, None] = OrderedDict()
+ART_STAGE_KEEP = 16
+
+
+def stage_art_file(path: str, staged: str, link: bool):
+    # runs on tpool; OBS must never see a half-written file
+    if os.path.exists(staged):
+        return
+    # only our own cache files are never rewritten in place, others are copied
+    if link:
+        try:
+            os.link(path, staged + ".part")
+        except OSError:
+            link = False
+    if not link:
+        shutil.copyfile(path, staged + ".part")
+    os.replace(staged + ".part", staged)
+
+
+async def stage_art(path: str) -> str:
+    # publish art under a name derived from its content: unchanged art keeps
+    # its path, so update_thumbnail skips it, and changed art always gets a
+    # new, complete file, so the image source reloads exactly once
+    if not path or not thumbdir:
+        return path
+    try:
+        cached = bool(thumbcache) and os.path.dirname(path) == thumbcache.directory
+        if cached:
+            digest = os.path.basename(path)
+        else:
+            _, digest = await loop.run_in_executor(tpool, read_art, path)
+        staged = os.path.join(thumbdir, f"art-{digest[:16]}")
+        await loop.run_in_executor(tpool, stage_art_file, path, staged, cached)
+    except Exception:
+        log.warning(f"Failed to stage art {path}", exc_info=True)
+        return path
+    stagedArt[staged] = None
+    stagedArt.move_to_end(staged)
+    while len(stagedArt) > ART_STAGE_KEEP:
+        old, _ = stagedArt.popitem(last=False)
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return staged
 
-    display_expr = compile(
-        obs.obs_data_get_string(settings, "display_expr"), "<string>", "eval"
-    )
-    source_name = obs.obs_data_get_string(settings, "source_name")
-    thumbsource_name = obs.obs_data_get_string(settings, "thumbsource_name")
-    session_name = obs.obs_data_get_string(settings, "session_name")
+###! <---
+###! SNAPSHOT
+###! --->
 
-    toenabled = obs.obs_data_get_bool(settings, "enabled")
-    if toenabled and not enabled:
-        log.info('Initalizing media controls')
-        runcoro(smcInitalizeAsync())
-        obs.timer_add(on_timer, 500)
-    elif not toenabled and enabled:
-        log.info('Deinitalizing media controls')
-        runcoro(smcDeinitalizeAsync())
-        obs.timer_remove(on_timer)
-    enabled = toenabled
-    if enabled:
-        runcoro(smcUpdateAsync())
+@dataclass(frozen=True, slots=True)
+class MediaSnapshot(Mapping):
+    """One capture of a media session, shared by both backends
+
+    Immutable, so consumers can keep it and compare by identity or equality.
+    Also a read-only mapping of field names so display expressions keep
+    working with data['title'] and the bare names.
+    """
+    artist: str | None = None
+    title: str | None = None
+    subtitle: str | None = None
+    track_number: int | None = None
+    genres: tuple[str, ...] | None = None
+    album_title: str | None = None
+    album_artist: str | None = None
+    album_track_count: int | None = None
+    # SMTC: a new IRandomAccessStreamReference per capture, MPRIS: staged
+    # file derived from art_url. Neither says anything about equality.
+    thumbnail: Any = field(default=None, compare=False)
+    art_url: str | None = None
+    url: str | None = None
+
+    position: timedelta | None = None
+    last_updated_time: datetime | None = None
+    start_time: timedelta | None = None
+    end_time: timedelta | None = None
+    min_seek_time: timedelta | None = None
+    max_seek_time: timedelta | None = None
+
+    playback_type: str | None = None
+    playback_rate: float | None = None
+    playback_status: str | None = None
+    repeat_mode: str | None = None
+    is_shuffle_active: bool | None = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in SNAPSHOT_FIELDSET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(SNAPSHOT_FIELDS)
+
+    def __len__(self) -> int:
+        return len(SNAPSHOT_FIELDS)
+
+    def __contains__(self, key: object) -> bool:
+        return key in SNAPSHOT_FIELDSET
+
+    def diff(self, other: "MediaSnapshot | None") -> frozenset[str]:
+        # names of the compared fields that differ, all of them against None
+        if other is None:
+            return COMPARED_FIELDS
+        if other is self:
+            return frozenset()
+        return frozenset(name for name in COMPARED_FIELDS if getattr(self, name) != getattr(other, name))
+
+
+SNAPSHOT_FIELDS = tuple(f.name for f in fields(MediaSnapshot))
+SNAPSHOT_FIELDSET = frozenset(SNAPSHOT_FIELDS)
+COMPARED_FIELDS = frozenset(f.name for f in fields(MediaSnapshot) if f.compare)
+# a change in any of these is a new track rather than progress on the current one
+TRACK_FIELDS = frozenset({
+    "artist", "title", "subtitle", "track_number", "genres",
+    "album_title", "album_artist", "album_track_count", "art_url", "url", "end_time",
+})
 
 ###! <---
 ###! SMTC
 ###! --->
 
-lastData: dict[str, Any] | None = None
+lastData: MediaSnapshot | None = None
 
 if MEDIACTRL == 'SMTC':
-    manager: SMTCManager | None = None
-    onCurrentSessionChangedToken: EventRegistrationToken | None = None
-    onSessionsChangedToken: EventRegistrationToken | None = None
-    currentSession: SMTCSession | None = None
-    onMediaPropChangedToken: EventRegistrationToken | None = None
-    onTimelineChangedToken: EventRegistrationToken | None = None
-    onPlaybackInfoChangedToken: EventRegistrationToken | None = None
-    thumbdir: str | None = None
+    manager: "SMTCManager | None" = None
+    onCurrentSessionChangedToken: "EventRegistrationToken | None" = None
+    onSessionsChangedToken: "EventRegistrationToken | None" = None
+    currentSession: "SMTCSession | None" = None
+    onMediaPropChangedToken: "EventRegistrationToken | None" = None
+    onTimelineChangedToken: "EventRegistrationToken | None" = None
+    onPlaybackInfoChangedToken: "EventRegistrationToken | None" = None
 
     async def smtcDeinitalizeAsync():
         global manager
@@ -271,18 +955,21 @@ if MEDIACTRL == 'SMTC':
         global onCurrentSessionChangedToken
         global onSessionsChangedToken
         await smtcDeinitalizeAsync()
+        import winrt.windows.foundation.collections as _ # projections for get_sessions() and friends
+        from winrt.windows.media.control import \
+            GlobalSystemMediaTransportControlsSessionManager as SMTCManager
         manager = await SMTCManager.request_async()
 
         def onCurrentSessionChanged(
-            sender: SMTCManager | None, event: CurrentSessionChangedEventArgs | None
+            sender: "SMTCManager | None", event: "CurrentSessionChangedEventArgs | None"
         ):
             assert sender
             session = sender.get_current_session()
             if session_name == '<default>':
-                runcoro(smtcSetSessionAsync(session))
+                submit(smtcSetSessionAsync(session))
 
         def onSessionsChanged(
-            sender: SMTCManager | None, event: SessionsChangedEventArgs | None
+            sender: "SMTCManager | None", event: "SessionsChangedEventArgs | None"
         ):
             global session_name_list
             session_name_list = []
@@ -294,7 +981,7 @@ if MEDIACTRL == 'SMTC':
                     preferred_session = session
                 session_name_list.append(session.source_app_user_model_id)
             if preferred_session:
-                runcoro(smtcSetSessionAsync(preferred_session))
+                submit(smtcSetSessionAsync(preferred_session))
 
 
         onCurrentSessionChangedToken = manager.add_current_session_changed(onCurrentSessionChanged)
@@ -303,7 +990,20 @@ if MEDIACTRL == 'SMTC':
         await smtcSetSessionAsync(manager.get_current_session())
 
 
-    async def smtcSetSessionAsync(session: SMTCSession | None):
+    async def smtcSelectSessionAsync():
+        # follow a changed session_name without reinitializing
+        if not manager:
+            return
+        session = manager.get_current_session()
+        if session_name != '<default>':
+            session = next(
+                (s for s in manager.get_sessions() if s.source_app_user_model_id == session_name), None
+            )
+        if session != currentSession:
+            await smtcSetSessionAsync(session)
+
+
+    async def smtcSetSessionAsync(session: "SMTCSession | None"):
         global currentSession
         global onMediaPropChangedToken
         global onTimelineChangedToken
@@ -324,50 +1024,53 @@ if MEDIACTRL == 'SMTC':
             return
 
         def onMediaPropChanged(
-            sender: SMTCSession | None, event: MediaPropertiesChangedEventArgs | None
+            sender: "SMTCSession | None", event: "MediaPropertiesChangedEventArgs | None"
         ):
-            runcoro(smtcUpdateAsync(currentSession))
+            request_update(thumb=True)
 
         onMediaPropChangedToken = currentSession.add_media_properties_changed(
             onMediaPropChanged
         )
 
         def onTimelineChanged(
-            sender: SMTCSession | None, event: TimelinePropertiesChangedEventArgs | None
+            sender: "SMTCSession | None", event: "TimelinePropertiesChangedEventArgs | None"
         ):
-            runcoro(smtcUpdateAsync(currentSession, thumb=False))
+            request_update(thumb=False)
 
         onTimelineChangedToken = currentSession.add_timeline_properties_changed(
             onTimelineChanged
         )
 
         def onPlaybackInfoChanged(
-            sender: SMTCSession | None, event: PlaybackInfoChangedEventArgs | None
+            sender: "SMTCSession | None", event: "PlaybackInfoChangedEventArgs | None"
         ):
-            runcoro(smtcUpdateAsync(currentSession, thumb=False))
+            request_update(thumb=False)
         
         onPlaybackInfoChangedToken = currentSession.add_playback_info_changed(onPlaybackInfoChanged)
 
         await smtcUpdateAsync(currentSession)
 
 
-    async def smtcUpdateAsync(session: SMTCSession | None, *, thumb: bool = True, capture: bool = True):
+    async def smtcUpdateAsync(session: "SMTCSession | None", *, thumb: bool = True, capture: bool = True):
         global lastData
         if capture:
             datas = await smtcCaptureAsync(session)
             data = datas[0] if datas else None
+            if data and data == lastData and not thumb:
+                # nothing moved, keep the bound snapshot
+                data = lastData
             lastData = data
         else:
             data = lastData
-        update_text(data)
-        if not data or not data.get('thumbnail'):
-            update_thumbnail('')
+        publish(data)
+        if not data or not data.thumbnail:
+            publish_art('')
         elif thumb:
-            file = await fetch_thumbnail_async(data.get("thumbnail"))
-            update_thumbnail(file)
+            file = await fetch_thumbnail_async(data.thumbnail)
+            publish_art(await stage_art(await process_art(file)))
 
-    @timeit
-    async def smtcCaptureAsync(session: SMTCSession | None) -> list[dict[str, Any]]:
+    @metrics.timed("capture")
+    async def smtcCaptureAsync(session: "SMTCSession | None") -> list[MediaSnapshot]:
         if not session:
             return []
         try:
@@ -388,7 +1091,7 @@ if MEDIACTRL == 'SMTC':
             "title": properties.title,
             "subtitle": properties.subtitle,
             "track_number": properties.track_number,
-            "genres": list(properties.genres) if properties.genres else None,
+            "genres": tuple(properties.genres) if properties.genres else None,
             "album_title": properties.album_title,
             "album_artist": properties.album_artist,
             "album_track_count": properties.album_track_count,
@@ -414,55 +1117,234 @@ if MEDIACTRL == 'SMTC':
                 'is_shuffle_active': playback.is_shuffle_active
             }
         log.debug(f"captured: {mediaprop}, {timelineprop} {playbackprop}")
-        return [{**mediaprop, **timelineprop, **playbackprop}]
+        return [MediaSnapshot(**mediaprop, **timelineprop, **playbackprop)]
     
-    async def fetch_thumbnail_async(thumb: IRandomAccessStreamReference) -> str:
-        assert thumbdir
+    @metrics.timed("thumbnail_fetch")
+    async def fetch_thumbnail_async(thumb: "IRandomAccessStreamReference") -> str:
+        assert thumbcache
+        from winrt.windows.storage.streams import DataReader
         with await thumb.open_read_async() as rastream:
             log.debug(f"received thumb {rastream.content_type} {rastream.size}bytes")
-            with open(os.path.join(thumbdir, "thumbnail"), "wb") as f:
-                log.debug(f"update_thumbnai_async mkstemp {f.name}")
-                with DataReader(rastream.get_input_stream_at(0)) as reader:
-                    await reader.load_async(rastream.size)
-                    while True:
-                        len = min(8192, reader.unconsumed_buffer_length)
-                        if len == 0:
-                            break
-                        try:
-                            buf = reader.read_buffer(len)
-                        except:
-                            log.warning(f"read_buffer({len}) failed", exc_info=True)
-                            break
-                        if not buf:
-                            break
-                        written = f.write(buf)
-                        log.debug(
-                            f"thumb written {written}, buf {buf.length}, read {len}"
-                        )
-                return f.name
+            with DataReader(rastream.get_input_stream_at(0)) as reader:
+                await reader.load_async(rastream.size)
+                content = bytes(reader.read_buffer(reader.unconsumed_buffer_length))
+        # content addressed, identical art is not written again
+        return await thumbcache.store(content)
     
     smcInitalizeAsync = smtcInitalizeAsync
     smcDeinitalizeAsync = smtcDeinitalizeAsync
+    smcSelectSessionAsync = smtcSelectSessionAsync
     async def smcUpdateAsync(*args, **kwargs):
         return await smtcUpdateAsync(currentSession, *args, **kwargs)
+    async def smcFlushAsync(*, thumb: bool):
+        await smtcUpdateAsync(currentSession, thumb=thumb)
 
 ###! <---
 ###! MPRIS
 ###! --->
 
 elif MEDIACTRL == 'MPRIS':
-    bus: MessageBus | None = None
-    playerobj: ProxyObject | None = None
-    
+    MPRIS_PREFIX = 'org.mpris.MediaPlayer2.'
+    MPRIS_PATH = '/org/mpris/MediaPlayer2'
+    MPRIS_PLAYER = 'org.mpris.MediaPlayer2.Player'
+    # the parts we use, so players never have to be introspected
+    MPRIS_NODE: "intr.Node | None" = None
+    MPRIS_XML = '''
+    <node>
+      <interface name="org.mpris.MediaPlayer2.Player">
+        <signal name="Seeked"><arg name="Position" type="x"/></signal>
+        <property name="Metadata" type="a{sv}" access="read"/>
+        <property name="PlaybackStatus" type="s" access="read"/>
+        <property name="LoopStatus" type="s" access="readwrite"/>
+        <property name="Rate" type="d" access="readwrite"/>
+        <property name="Position" type="x" access="read"/>
+      </interface>
+      <interface name="org.freedesktop.DBus.Properties">
+        <method name="GetAll">
+          <arg name="interface_name" type="s" direction="in"/>
+          <arg name="properties" type="a{sv}" direction="out"/>
+        </method>
+        <signal name="PropertiesChanged">
+          <arg name="interface_name" type="s"/>
+          <arg name="changed_properties" type="a{sv}"/>
+          <arg name="invalidated_properties" type="as"/>
+        </signal>
+      </interface>
+    </node>
+    '''
+
+    bus: "MessageBus | None" = None
+    players: dict[str, 'MprisPlayer'] = {}
+    activeName: str | None = None
+    httpsession: "aiohttp.ClientSession | None" = None
+    HTTP_LIMIT = 8
+    HTTP_LIMIT_PER_HOST = 2
+    HTTP_TIMEOUT = {"total": 10, "sock_connect": 3, "sock_read": 5} # s
+    THUMB_DEFAULT_MAX_AGE = 24 * 60 * 60 # s
+
+    class MprisPlayer:
+        def __init__(self, busname: str):
+            assert(bus)
+            self.busname = busname
+            self.proxy = bus.get_proxy_object(busname, MPRIS_PATH, MPRIS_NODE)
+            self.player = self.proxy.get_interface(MPRIS_PLAYER)
+            self.properties = self.proxy.get_interface('org.freedesktop.DBus.Properties')
+            self.data: MediaSnapshot | None = None
+            # signalled but not yet applied, see flush()
+            self.pending: dict[str, Any] = {}
+            self.pendingFull = True
+            self.pendingSeek: int | None = None
+            self.coalescer = UpdateCoalescer(self.flush)
+            self.properties.on_properties_changed(self.on_properties_changed) # type: ignore
+            self.player.on_seeked(self.on_seeked) # type: ignore
+
+        def close(self):
+            self.properties.off_properties_changed(self.on_properties_changed) # type: ignore
+            self.player.off_seeked(self.on_seeked) # type: ignore
+            if self.coalescer.task:
+                self.coalescer.task.cancel()
+
+        def on_properties_changed(self, interface, changed, invalidated):
+            log.debug(f'MPRIS on_properties_changed: {self.busname} {interface!r} {changed!r} {invalidated!r}')
+            if interface != MPRIS_PLAYER:
+                return
+            self.pending.update({k: v.value for k, v in changed.items()})
+            self.pendingFull = self.pendingFull or bool(invalidated)
+            self.coalescer.request(thumb=False)
+
+        def on_seeked(self, pos):
+            log.debug(f'MPRIS on_seeked: {self.busname} {pos}')
+            self.pendingSeek = pos
+            self.coalescer.request(thumb=False)
+
+        async def getAll(self) -> dict[str, Any]:
+            # one round trip instead of a Get per property
+            assert(bus)
+            reply = await bus.call(
+            Message(destination=self.busname,
+                    path=MPRIS_PATH,
+                    interface='org.freedesktop.DBus.Properties',
+                    member='GetAll',
+                    signature='s',
+                    body=[MPRIS_PLAYER]))
+            assert(reply)
+            if reply.message_type == MessageType.ERROR:
+                raise RuntimeError(reply.body[0])
+            return {k: v.value for k, v in reply.body[0].items()}
+
+        async def getPosition(self) -> timedelta:
+            return timedelta(microseconds=await self.player.get_position()) # type: ignore
+
+        @metrics.timed("capture")
+        async def capture(self) -> MediaSnapshot:
+            props = await self.getAll()
+            track = mprisTrackFields(props.get('Metadata', {}))
+            playback = {'playback_rate': 1.0, **mprisPlaybackFields(props)}
+            data = MediaSnapshot(
+                **track,
+                thumbnail=await mprisFetchThumbnail(track['art_url']) if track['art_url'] else None,
+
+                # some players leave Position out of GetAll
+                position=timedelta(microseconds=props['Position']) if 'Position' in props else await self.getPosition(),
+                last_updated_time=datetime.now(timezone.utc),
+
+                **playback,
+            )
+            log.debug(f"captured {self.busname}: {data}")
+            return data
+
+        async def flush(self, *, thumb: bool = True):
+            # apply everything signalled since the last flush in one go
+            changed = self.pending
+            self.pending = {}
+            full, self.pendingFull = self.pendingFull, False
+            seek, self.pendingSeek = self.pendingSeek, None
+            previous = self.data
+            if full or previous is None:
+                self.data = await self.capture()
+                thumb = True
+            else:
+                data = previous
+                if seek is not None:
+                    data = replace(
+                        data,
+                        position=timedelta(microseconds=seek),
+                        last_updated_time=datetime.now(timezone.utc),
+                    )
+                if changed:
+                    data, thumb = await self.applyChanges(data, changed)
+                # an unchanged snapshot keeps its identity, the display binding stays valid
+                diff = data.diff(previous)
+                self.data = data if diff else previous
+                log.debug(f"flushed {self.busname}: {'new track' if diff & TRACK_FIELDS else sorted(diff)}")
+            if self.busname == activeName and (self.data is not previous or thumb):
+                mprisPublish(self.data, thumb=thumb)
+
+        async def applyChanges(self, base: MediaSnapshot, changed: dict[str, Any]) -> tuple[MediaSnapshot, bool]:
+            # merge PropertiesChanged payloads into the snapshot instead of capturing everything again
+            updates = mprisPlaybackFields(changed)
+            thumb = False
+            if 'Metadata' in changed:
+                updates.update(mprisTrackFields(changed['Metadata']))
+                if updates['art_url'] != base.art_url:
+                    updates['thumbnail'] = await mprisFetchThumbnail(updates['art_url']) if updates['art_url'] else None
+                    thumb = True
+            if changed.keys() & {'Metadata', 'PlaybackStatus', 'Rate'}:
+                # Position is never signalled, re-anchor the prediction
+                updates['position'] = await self.getPosition()
+                updates['last_updated_time'] = datetime.now(timezone.utc)
+            log.debug(f"applied changes {self.busname}: {list(changed)}")
+            return replace(base, **updates), thumb
+
+    def mprisImport():
+        global intr
+        global MessageBus
+        global Message
+        global MessageType
+        global MPRIS_NODE
+        if MPRIS_NODE:
+            return
+        from dbus_next import introspection as intr
+        from dbus_next.aio.message_bus import MessageBus
+        from dbus_next.constants import MessageType
+        from dbus_next.message import Message
+        MPRIS_NODE = intr.Node.parse(MPRIS_XML)
+
     async def mprisInitalize():
         global bus
+        await mprisDeinitalize()
+        mprisImport()
         log.info('Initalizing DBus')
         bus = await MessageBus().connect()
+        bus.add_message_handler(mprisOnMessage)
+        await bus.call(
+        Message(destination='org.freedesktop.DBus',
+                path='/org/freedesktop/DBus',
+                interface='org.freedesktop.DBus',
+                member='AddMatch',
+                signature='s',
+                body=["type='signal',sender='org.freedesktop.DBus',interface='org.freedesktop.DBus',"
+                      "member='NameOwnerChanged',arg0namespace='org.mpris.MediaPlayer2'"]))
         await mprisDiscoverService()
-    
+
+    async def mprisDeinitalize():
+        global bus
+        global activeName
+        global httpsession
+        for player in players.values():
+            player.close()
+        players.clear()
+        activeName = None
+        if bus:
+            bus.remove_message_handler(mprisOnMessage)
+            bus.disconnect()
+            bus = None
+        if httpsession:
+            await httpsession.close()
+            httpsession = None
+
     async def mprisDiscoverService():
-        global playerobj
-        global session_name_list
+        # only called once, afterwards the registry follows NameOwnerChanged
         assert(bus)
 
         reply = await bus.call(
@@ -475,161 +1357,1085 @@ elif MEDIACTRL == 'MPRIS':
             raise RuntimeError(reply.body[0])
 
         services: list[str] = reply.body[0]
-        players = [s for s in services if s.startswith('org.mpris.MediaPlayer2.')]
-
-        session_name_list = []
+        for name in services:
+            if name.startswith(MPRIS_PREFIX):
+                mprisAddPlayer(name)
         if not players:
             log.debug('No MPRIS players found')
-            playerobj = None
+        # whatever the sources showed before is stale, even with no player to switch to
+        mprisActivate(initial=True)
+
+    def mprisOnMessage(msg: "Message"):
+        if (
+            msg.message_type != MessageType.SIGNAL
+            or msg.member != 'NameOwnerChanged'
+            or msg.interface != 'org.freedesktop.DBus'
+        ):
             return
-        session_name_list = players[::]
-        if session_name == '<default>':
-            if 'org.mpris.MediaPlayer2.playerctld' in players:
-                busname = 'org.mpris.MediaPlayer2.playerctld'
-            else:
-                busname = players[0]
-        else:
-            busname = session_name
-        log.info(f'Using MPRIS bus {busname}')
-        
-        introspect = await bus.introspect(busname, '/org/mpris/MediaPlayer2')
-        playerobj = bus.get_proxy_object(busname, '/org/mpris/MediaPlayer2', introspect)
-
-        playeriface = playerobj.get_interface('org.mpris.MediaPlayer2.Player')
-        propiface = playerobj.get_interface('org.freedesktop.DBus.Properties')
-
-        async def on_properties_changed(interface, changed, invalidated):
-            log.debug(f'MPRIS on_properties_changed: {interface!r} {changed!r} {invalidated!r}')
-            await mprisUpdate()
-        
-        async def on_seeked(pos):
-            log.debug(f'MPRIS on_seeked: {pos}')
-            await mprisUpdate()
-
-        propiface.on_properties_changed(on_properties_changed) # type: ignore
-        playeriface.on_seeked(on_seeked) # type: ignore
-
-    @timeit
-    async def mprisCapture():
-        assert(playerobj)
-        player = playerobj.get_interface('org.mpris.MediaPlayer2.Player')
-        meta: dict[str, Any] = await player.get_metadata() # type: ignore
-        meta = {k.lower(): v.value for k,v in meta.items()}
-        position = timedelta(microseconds=await player.get_position()) # type: ignore
-        data = {
+        name, old, new = msg.body
+        if not name.startswith(MPRIS_PREFIX):
+            return
+        log.debug(f'MPRIS NameOwnerChanged: {name} {old!r} -> {new!r}')
+        if old and name in players:
+            players.pop(name).close()
+        if new:
+            mprisAddPlayer(name)
+        mprisActivate()
+
+    def mprisAddPlayer(name: str):
+        global session_name_list
+        if name in players:
+            return
+        player = MprisPlayer(name)
+        players[name] = player
+        player.coalescer.request()
+        session_name_list = list(players)
+
+    def mprisSelect() -> str | None:
+        if session_name != '<default>':
+            return session_name if session_name in players else None
+        if 'org.mpris.MediaPlayer2.playerctld' in players:
+            return 'org.mpris.MediaPlayer2.playerctld'
+        return next(iter(players), None)
+
+    def mprisActivate(*, initial: bool = False):
+        # switch to the selected player and show its snapshot right away; one not
+        # captured yet publishes from its first flush instead of flashing NO MEDIA
+        global activeName
+        global session_name_list
+        session_name_list = list(players)
+        name = mprisSelect()
+        if name == activeName and not initial:
+            return
+        if name != activeName:
+            log.info(f'Using MPRIS bus {name}')
+        activeName = name
+        if name is None:
+            mprisPublish(None)
+        elif players[name].data is not None:
+            mprisPublish(players[name].data)
+
+    def mprisTrackFields(metadata: dict[str, Any]) -> dict[str, Any]:
+        meta: dict[str, Any] = {k.lower(): v.value for k,v in metadata.items()}
+        return {
             'artist': ', '.join(meta.get('xesam:artist', [])),
             'title': meta.get('xesam:title'),
             'track_number': meta.get('xesam:tracknumber'),
-            'genres': meta.get('xesam:genre'),
+            'genres': tuple(meta['xesam:genre']) if 'xesam:genre' in meta else None,
             'album_title': meta.get('xesam:album'),
             'album_artist': meta.get('xesam:albumartist'),
             'album_track_count': meta.get('xesam:albumtrackcount'),
-            'thumbnail': await mprisFetchThumbnail(meta['mpris:arturl']) if 'mpris:arturl' in meta else None,
-
-            'position': position,
+            'art_url': meta.get('mpris:arturl'),
+            'url': meta.get('xesam:url'),
             'end_time': timedelta(microseconds=meta['mpris:length']),
-            'last_updated_time': datetime.now(timezone.utc),
-
-            'playback_status': await player.get_playback_status(), # type: ignore
-            'repeat_mode': await player.get_loop_status(), # type: ignore
-            'playback_rate': await player.get_rate(), # type: ignore
         }
-        log.debug(f"captured: {data}")
-        return [data]
-    
-    async def mprisUpdate(*, thumb: bool = True, capture: bool = True):
+
+    def mprisPlaybackFields(props: dict[str, Any]) -> dict[str, Any]:
+        fields = {}
+        if 'PlaybackStatus' in props:
+            fields['playback_status'] = props['PlaybackStatus']
+        if 'LoopStatus' in props:
+            fields['repeat_mode'] = props['LoopStatus']
+        if 'Rate' in props:
+            fields['playback_rate'] = props['Rate']
+        return fields
+
+    def mprisPublish(data: MediaSnapshot | None, *, thumb: bool = True):
         global lastData
-        if capture:
-            datas = await mprisCapture()
-            data = datas[0] if datas else None
-            lastData = data
-        else:
-            data = lastData
-        update_text(data)
-        if not data or not data.get('thumbnail'):
-            update_thumbnail('')
+        lastData = data
+        publish(data)
+        if not data or not data.thumbnail:
+            publish_art('')
         elif thumb:
-            file = data["thumbnail"]
-            update_thumbnail(file)
-    
+            publish_art(data.thumbnail)
+
+    async def mprisUpdate(*, thumb: bool = True, capture: bool = True):
+        mprisActivate()
+        player = players.get(activeName) if activeName else None
+        if player and capture:
+            player.pendingFull = True
+            await player.flush()
+        else:
+            mprisPublish(player.data if player else None, thumb=thumb)
+
+    def getHttpSession() -> "aiohttp.ClientSession":
+        # must be called on loop, the session and its connection pool live there
+        global httpsession
+        if httpsession is None or httpsession.closed:
+            import aiohttp
+            httpsession = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=HTTP_LIMIT, limit_per_host=HTTP_LIMIT_PER_HOST, ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(**HTTP_TIMEOUT),
+                trust_env=True,
+            )
+        return httpsession
+
+    def httpMaxAge(headers) -> float:
+        cachecontrol = headers.get('Cache-Control', '').lower()
+        if 'no-cache' in cachecontrol or 'no-store' in cachecontrol:
+            return 0
+        for directive in cachecontrol.split(','):
+            name, _, value = directive.strip().partition('=')
+            if name == 'max-age' and value.isdigit():
+                return int(value)
+        return THUMB_DEFAULT_MAX_AGE
+
     async def mprisFetchThumbnail(url: str):
+        return await stage_art(await process_art(await mprisDownloadThumbnail(url)))
+
+    @metrics.timed("thumbnail_fetch")
+    async def mprisDownloadThumbnail(url: str):
         parsed = urllib.parse.urlparse(url)
         if parsed.scheme == 'file':
             return urllib.parse.unquote_plus(parsed.path)
         if parsed.scheme == 'http' or parsed.scheme == 'https':
-            assert(thumbdir)
-            async with aiohttp.ClientSession(trust_env=True) as session:
-                async with session.get(url) as resp:
-                    resp.raise_for_status()
-                    with open(os.path.join(thumbdir, url.replace('/', '_')), 'wb') as f:
-                        f.write(await resp.read())
-                        return f.name
+            assert(thumbcache)
+            if cached := thumbcache.lookup(url):
+                return cached
+            start = time.perf_counter()
+            async with getHttpSession().get(url, headers=thumbcache.validators(url)) as resp:
+                if resp.status == 304 and (path := thumbcache.revalidated(url, httpMaxAge(resp.headers))):
+                    log.debug(f"thumb {url} not modified in {(time.perf_counter() - start) * 1000:.1f}ms")
+                    return path
+                resp.raise_for_status()
+                path = await thumbcache.store(
+                    await resp.read(),
+                    url,
+                    etag=resp.headers.get('ETag'),
+                    last_modified=resp.headers.get('Last-Modified'),
+                    max_age=httpMaxAge(resp.headers),
+                )
+                log.debug(f"thumb {url} fetched in {(time.perf_counter() - start) * 1000:.1f}ms")
+                return path
         raise ValueError(f"Unsupported thumbnail URL: {url}")
     
     smcInitalizeAsync = mprisInitalize
-    async def smcDeinitalizeAsync():
-        pass
+    smcDeinitalizeAsync = mprisDeinitalize
     smcUpdateAsync = mprisUpdate
+    smcFlushAsync = mprisUpdate
+    async def smcSelectSessionAsync():
+        mprisActivate()
     
 
-def update_text(data: dict[str, Any] | None):
-    def roundtd(td: timedelta) -> timedelta:
-        return timedelta(seconds=round(td.total_seconds()))
+###! <---
+###! LYRICS
+###! --->
+
+LRC_TAG = re.compile(r"\[(\d+):(\d+(?:[.:]\d+)?)\]")
+LRC_OFFSET = re.compile(r"\[offset:\s*([+-]?\d+)\]", re.IGNORECASE)
+LRC_UNSAFE = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+LYRICS_CACHE_SIZE = 32
+
+
+class Lyrics:
+    """Synced lyrics as parallel arrays sorted by time, looked up with bisect"""
+
+    __slots__ = ("times", "lines")
+
+    def __init__(self, text: str):
+        offset = 0.0
+        if m := LRC_OFFSET.search(text):
+            # positive offset shows lines sooner
+            offset = int(m.group(1)) / 1000
+        entries: list[tuple[float, str]] = []
+        for raw in text.splitlines():
+            tags = []
+            pos = 0
+            while m := LRC_TAG.match(raw, pos):
+                tags.append(int(m.group(1)) * 60 + float(m.group(2).replace(":", ".")) - offset)
+                pos = m.end()
+            line = raw[pos:].strip()
+            entries.extend((t, line) for t in tags)
+        entries.sort(key=lambda e: e[0])
+        self.times = [t for t, _ in entries]
+        self.lines = [line for _, line in entries]
+
+    def index(self, pos: float) -> int:
+        # line shown at pos, -1 before the first one
+        return bisect.bisect_right(self.times, pos) - 1
+
+    def line(self, pos: float) -> str:
+        i = self.index(pos)
+        return self.lines[i] if i >= 0 else ""
+
+    def next_line(self, pos: float) -> str:
+        i = self.index(pos) + 1
+        return self.lines[i] if i < len(self.lines) else ""
+
+    def next_change(self, pos: float, rate: float) -> float | None:
+        # position of the next line switch in the direction of playback
+        i = self.index(pos)
+        if rate > 0:
+            return self.times[i + 1] if i + 1 < len(self.times) else None
+        return self.times[i] if i >= 0 else None
+
+
+def lyrics_key(data: MediaSnapshot) -> tuple[str | None, str | None, str | None]:
+    return (data.url, data.artist, data.title)
+
+
+def lyrics_paths(key: tuple[str | None, str | None, str | None], directory: str) -> list[str]:
+    url, artist, title = key
+    paths = []
+    if url and url.startswith("file://"):
+        from urllib.request import url2pathname # pulls in http.client, not worth it at import
+        path = url2pathname(urllib.parse.urlparse(url).path)
+        paths.append(os.path.splitext(path)[0] + ".lrc")
+    if directory and title:
+        name = f"{artist} - {title}" if artist else title
+        paths.append(os.path.join(directory, LRC_UNSAFE.sub("_", name) + ".lrc"))
+    return paths
+
+
+def load_lyrics(paths: list[str]) -> Lyrics | None:
+    # runs on tpool
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8-sig", errors="replace") as f:
+                lyrics = Lyrics(f.read())
+        except OSError:
+            continue
+        if lyrics.times:
+            log.debug(f"lyrics: {len(lyrics.times)} lines from {path}")
+            return lyrics
+    return None
+
+
+# track key -> parsed lyrics, None if there are none
+lyricsCache: OrderedDict[tuple, Lyrics | None] = OrderedDict()
+lyricsLoading: set[tuple] = set()
+
+def lyrics_for(data: MediaSnapshot | None) -> Lyrics | None:
+    # must be called on loop; starts loading on a miss and re-renders once loaded
+    if not data:
+        return None
+    key = lyrics_key(data)
+    if key in lyricsCache:
+        lyricsCache.move_to_end(key)
+        return lyricsCache[key]
+    if key not in lyricsLoading:
+        lyricsLoading.add(key)
+        fut = loop.run_in_executor(tpool, load_lyrics, lyrics_paths(key, lyrics_dir))
+        fut.add_done_callback(functools.partial(lyrics_loaded, key))
+    return None
+
+def lyrics_loaded(key: tuple, fut: asyncio.Future):
+    lyricsLoading.discard(key)
+    lyricsCache[key] = None if fut.cancelled() or fut.exception() else fut.result()
+    while len(lyricsCache) > LYRICS_CACHE_SIZE:
+        lyricsCache.popitem(last=False)
+    if lyricsCache[key] and lastData and lyrics_key(lastData) == key:
+        update_text(lastData)
 
-    def fmttd(td: timedelta):
-        return str(td).removeprefix("0:").removeprefix("0")
 
-    def posavail():
-        return data and (
-            "last_updated_time" in data
-            and cast(datetime, data["last_updated_time"]).year != 1601
-        )
+###! <---
+###! EXPR
+###! --->
+
+# names whose value changes without a new capture, anything using them is
+# evaluated on every tick
+DYNAMIC_NAMES = {"predictedpos", "lyric_line", "next_lyric_line"}
+LYRIC_NAMES = {"lyric_line", "next_lyric_line"}
+PURE_BUILTINS = {
+    "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float",
+    "format", "int", "isinstance", "len", "list", "map", "max", "min", "range",
+    "repr", "reversed", "round", "set", "sorted", "str", "sum", "tuple", "zip",
+}
+UNHOISTABLE = (ast.Constant, ast.Name, ast.FormattedValue, ast.Starred, ast.Slice)
+SCOPES = (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+class ExprNamespace(dict):
+    # modules resolve on first use instead of copying all of sys.modules
+    def __missing__(self, key):
+        try:
+            return sys.modules[key]
+        except KeyError:
+            raise KeyError(key) from None
+
+
+def roundtd(td: timedelta) -> timedelta:
+    return timedelta(seconds=round(td.total_seconds()))
+
+
+def fmttd(td: timedelta):
+    return str(td).removeprefix("0:").removeprefix("0")
+
+
+def predicted_position(data: MediaSnapshot) -> timedelta:
+    assert data.position is not None and data.last_updated_time is not None
+    if data.playback_status != 'Playing':
+        return data.position
+    return data.position+(datetime.now(timezone.utc)-data.last_updated_time)*(data.playback_rate or 0.0)
 
+
+def posavail(data: MediaSnapshot | None):
+    return data and (
+        data.last_updated_time is not None
+        and data.last_updated_time.year != 1601
+    )
+
+
+def expr_helpers(data: MediaSnapshot | None) -> dict[str, Any]:
     def predictedpos() -> timedelta:
         assert(data)
-        if data['playback_status'] != 'Playing':
-            return data['position']
-        return data['position']+(datetime.now(timezone.utc)-data['last_updated_time'])*data['playback_rate']
+        return predicted_position(data)
+
+    def lyric_line() -> str:
+        lyrics = lyrics_for(data)
+        return lyrics.line(predictedpos().total_seconds()) if lyrics and posavail(data) else ""
+
+    def next_lyric_line() -> str:
+        lyrics = lyrics_for(data)
+        return lyrics.next_line(predictedpos().total_seconds()) if lyrics and posavail(data) else ""
 
-    namespace: dict[str, Any] = {
+    return {
         "data": data,
         "roundtd": roundtd,
         "fmttd": fmttd,
-        "posavail": posavail,
+        "posavail": lambda: posavail(data),
         "predictedpos": predictedpos,
+        "lyric_line": lyric_line,
+        "next_lyric_line": next_lyric_line,
     }
-    namespace.update(sys.modules)
-    if data:
-        namespace.update(data)
+
+
+def bound_names(node: ast.AST) -> set[str]:
+    names = set()
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Name) and isinstance(sub.ctx, ast.Store):
+            names.add(sub.id)
+        elif isinstance(sub, ast.arg):
+            names.add(sub.arg)
+    return names
+
+
+def volatile_names(node: ast.AST) -> set[str]:
+    names = set()
+    for sub in ast.walk(node):
+        if isinstance(sub, (ast.NamedExpr, ast.Await, ast.Yield, ast.YieldFrom)):
+            names.add("<side effect>")
+        elif isinstance(sub, ast.Name) and isinstance(sub.ctx, ast.Load):
+            if (
+                sub.id in DYNAMIC_NAMES
+                or sub.id in sys.modules
+                or (sub.id in builtins.__dict__ and sub.id not in PURE_BUILTINS)
+            ):
+                names.add(sub.id)
+    return names
+
+
+class StaticHoister(ast.NodeTransformer):
+    """Replace maximal snapshot-constant subexpressions with __static__(i)"""
+
+    def __init__(self, tree: ast.AST):
+        self.hoisted: list[ast.expr] = []
+        self.scopes: list[set[str]] = []
+        # bound by := somewhere, only known once evaluation gets there
+        self.assigned = {n.target.id for n in ast.walk(tree) if isinstance(n, ast.NamedExpr)}
+
+    def is_static(self, node: ast.AST) -> bool:
+        if volatile_names(node):
+            return False
+        used = {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+        if used & self.assigned:
+            return False
+        if self.scopes:
+            inner = bound_names(node)
+            if any(used & (scope - inner) for scope in self.scopes):
+                return False
+        return True
+
+    def visit(self, node: ast.AST):
+        if (
+            isinstance(node, ast.expr)
+            and not isinstance(node, UNHOISTABLE)
+            and not isinstance(getattr(node, "ctx", None), ast.Store)
+            and self.is_static(node)
+        ):
+            self.hoisted.append(node)
+            call = ast.Call(ast.Name("__static__", ast.Load()), [ast.Constant(len(self.hoisted) - 1)], [])
+            return ast.copy_location(call, node)
+        if isinstance(node, SCOPES):
+            self.scopes.append(bound_names(node))
+            try:
+                return self.generic_visit(node)
+            finally:
+                self.scopes.pop()
+        return self.generic_visit(node)
+
+
+class DisplayExpr:
+    FILENAME = "<display_expr>"
+
+    def __init__(self, source: str):
+        tree = ast.parse(source, self.FILENAME, "eval")
+        self.dynamic_names = volatile_names(tree)
+        hoister = StaticHoister(tree)
+        body = hoister.visit(tree.body)
+        self.static_codes = [
+            compile(ast.fix_missing_locations(ast.Expression(node)), self.FILENAME, "eval")
+            for node in hoister.hoisted
+        ]
+        self.code = compile(ast.fix_missing_locations(ast.Expression(body)), self.FILENAME, "eval")
+        self._data: MediaSnapshot | None = None
+        self._namespace: ExprNamespace | None = None
+        log.debug(f"display expr: {len(self.static_codes)} static parts, dynamic names {self.dynamic_names}")
+
+    def bind(self, data: MediaSnapshot | None):
+        namespace = ExprNamespace(expr_helpers(data))
+        if data:
+            namespace.update(data)
+        values: list[tuple[Any, BaseException | None, Any]] = []
+        for code in self.static_codes:
+            try:
+                values.append((eval(code, namespace), None, None))
+            except Exception as exc:
+                # only raised if the branch using it is actually evaluated
+                values.append((None, exc, exc.__traceback__))
+
+        def static(i: int):
+            value, exc, tb = values[i]
+            if exc is not None:
+                raise exc.with_traceback(tb)
+            return value
+
+        namespace["__static__"] = static
+        self._data = data
+        self._namespace = namespace
+
+    def render(self, data: MediaSnapshot | None) -> Any:
+        if self._namespace is None or data is not self._data:
+            self.bind(data)
+        return eval(self.code, self._namespace)
+
+
+# template name -> helper name in DYNAMIC_NAMES
+TEMPLATE_DYNAMIC = {"pos": "predictedpos", "lyric": "lyric_line", "next_lyric": "next_lyric_line"}
+TEMPLATE_NAMES = (SNAPSHOT_FIELDSET - {"thumbnail"}) | TEMPLATE_DYNAMIC.keys()
+
+
+def template_value(value: Any, spec: str) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, timedelta):
+        value = fmttd(roundtd(value))
+    elif isinstance(value, (list, tuple)):
+        value = ", ".join(map(str, value))
+    return format(value, spec) if spec else str(value)
+
+
+def template_sample(kind: Any) -> Any:
+    # a value of the field's type, to check format specs against at parse time
+    kind = next(arg for arg in get_args(kind) or (kind,) if arg is not type(None))
+    kind = get_origin(kind) or kind
+    samples = {timedelta: timedelta(0), datetime: datetime.now(timezone.utc), tuple: ("",)}
+    return samples.get(kind, kind() if kind in (str, int, float, bool) else "")
+
+
+TEMPLATE_SAMPLES = {
+    **{f.name: template_sample(f.type) for f in fields(MediaSnapshot)},
+    "pos": timedelta(0), "lyric": "", "next_lyric": "",
+}
+
+
+class TemplateField:
+    __slots__ = ("name", "spec")
+
+    def __init__(self, name: str, spec: str):
+        self.name = name
+        self.spec = spec
+
+
+class TemplateSection:
+    __slots__ = ("name", "negate", "body")
+
+    def __init__(self, name: str, negate: bool):
+        self.name = name
+        self.negate = negate
+        self.body: list[Any] = []
+
+
+class DisplayTemplate:
+    """Placeholder template, the cheap alternative to DisplayExpr
+
+    Parsed once; bind() resolves everything that only depends on the snapshot
+    to text, leaving a flat list of strings and getters for the dynamic parts,
+    so render() is one join.
+    """
+    TOKEN = re.compile(r"\{\{|\}\}|\{([?!]?)(\w*)(?::([^{}]*))?\}|\{/\}")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.dynamic_names: set[str] = set()
+        self.body = self.parse(source)
+        self._data: MediaSnapshot | None = None
+        self._segments: list[str | Callable[[], str]] | None = None
+        self._text: str | None = None
+
+    def parse(self, source: str) -> list[Any]:
+        root: list[Any] = []
+        stack: list[TemplateSection] = []
+        body = root
+        pos = 0
+        for m in self.TOKEN.finditer(source):
+            if m.start() > pos:
+                body.append(source[pos:m.start()])
+            pos = m.end()
+            token = m.group()
+            if token in ("{{", "}}"):
+                body.append(token[0])
+            elif token == "{/}":
+                if not stack:
+                    raise ValueError(f"template: unmatched {{/}} at {m.start()}")
+                stack.pop()
+                body = stack[-1].body if stack else root
+            else:
+                kind, name, spec = m.group(1), m.group(2), m.group(3) or ""
+                if name not in TEMPLATE_NAMES and not (kind and name == "data"):
+                    raise ValueError(f"template: unknown name {name!r} at {m.start()}")
+                if name in TEMPLATE_DYNAMIC:
+                    self.dynamic_names.add(TEMPLATE_DYNAMIC[name])
+                if kind:
+                    section = TemplateSection(name, kind == "!")
+                    body.append(section)
+                    stack.append(section)
+                    body = section.body
+                else:
+                    try:
+                        template_value(TEMPLATE_SAMPLES[name], spec)
+                    except (ValueError, TypeError) as exc:
+                        raise ValueError(f"template: bad format {spec!r} for {name} at {m.start()}: {exc}") from None
+                    body.append(TemplateField(name, spec))
+        if pos < len(source):
+            body.append(source[pos:])
+        if stack:
+            raise ValueError(f"template: {{{'!' if stack[-1].negate else '?'}{stack[-1].name}}} is never closed")
+        return root
+
+    @staticmethod
+    def getter(name: str, data: MediaSnapshot | None, available: bool) -> Callable[[], Any]:
+        if not available:
+            return lambda: None
+        assert data
+        if name == "pos":
+            return lambda: predicted_position(data)
+        if name == "lyric":
+            return lambda: (lyrics := lyrics_for(data)) and lyrics.line(predicted_position(data).total_seconds())
+        return lambda: (lyrics := lyrics_for(data)) and lyrics.next_line(predicted_position(data).total_seconds())
+
+    @staticmethod
+    def static_value(name: str, data: MediaSnapshot | None, available: bool) -> Any:
+        if name == "data":
+            return data
+        if name == "pos":
+            # the section tests availability, which only depends on the snapshot
+            return available
+        return getattr(data, name) if data else None
+
+    @staticmethod
+    def add(segments: list, part: Any):
+        # adjacent text is joined once here instead of on every render
+        if isinstance(part, str) and segments and isinstance(segments[-1], str):
+            segments[-1] += part
+        else:
+            segments.append(part)
+
+    def flatten(self, body: list[Any], data: MediaSnapshot | None, available: bool) -> list:
+        segments: list[str | Callable[[], str]] = []
+        for node in body:
+            if isinstance(node, str):
+                self.add(segments, node)
+            elif isinstance(node, TemplateField):
+                if node.name in TEMPLATE_DYNAMIC:
+                    get = self.getter(node.name, data, available)
+                    self.add(segments, functools.partial(render_field, get, node.spec))
+                else:
+                    self.add(segments, template_value(self.static_value(node.name, data, available), node.spec))
+            elif node.name in TEMPLATE_DYNAMIC and node.name != "pos":
+                get = self.getter(node.name, data, available)
+                inner = self.flatten(node.body, data, available)
+                self.add(segments, functools.partial(render_section, get, node.negate, inner))
+            elif bool(self.static_value(node.name, data, available)) != node.negate:
+                for part in self.flatten(node.body, data, available):
+                    self.add(segments, part)
+        return segments
+
+    def bind(self, data: MediaSnapshot | None):
+        segments = self.flatten(self.body, data, bool(data and posavail(data)))
+        self._data = data
+        self._segments = segments
+        self._text = join_segments(segments) if all(isinstance(s, str) for s in segments) else None
+
+    def render(self, data: MediaSnapshot | None) -> str:
+        if self._segments is None or data is not self._data:
+            self.bind(data)
+        if self._text is not None:
+            return self._text
+        return join_segments(cast(list, self._segments))
+
+
+def join_segments(segments: list[str | Callable[[], str]]) -> str:
+    return "".join([s if isinstance(s, str) else s() for s in segments])
+
+
+def render_field(get: Callable[[], Any], spec: str) -> str:
+    return template_value(get(), spec)
+
+
+def render_section(get: Callable[[], Any], negate: bool, body: list[str | Callable[[], str]]) -> str:
+    return join_segments(body) if bool(get()) != negate else ""
+
+
+def update_text(data: MediaSnapshot | None):
     if display_expr:
+        start = time.perf_counter()
         try:
-            now_playing = eval(display_expr, namespace)
+            now_playing = display_expr.render(data)
         except:
             log.warning("Failed to evaluate display expression", exc_info=True)
             now_playing = "..."
+        metrics.observe("render", (time.perf_counter() - start) * 1000)
     else:
         log.warning('No display expression')
         now_playing = "..."
+    if update_source_string(source_name, "text", now_playing):
+        log.debug(f"source {source_name}: {now_playing} <- {data}")
+    fileSink.text(now_playing)
+    schedule_refresh(data)
+
+def update_thumbnail(file: str):
+    if update_source_string(thumbsource_name, "file", file):
+        log.debug(
+            f"source {thumbsource_name}: {file}"
+        )
+
+# (source name, setting) -> last value pushed to OBS
+pushedValues: dict[tuple[str, str], str] = {}
+# (source name, setting) -> value waiting for the OBS thread, latest wins
+pendingValues: dict[tuple[str, str], str] = {}
+pendingLock = threading.Lock()
+FRAME_INTERVAL = 1 / 60 # s, sources are drained once per frame, see script_tick
+DRAIN_BUDGET = 0.0005 # s
+
+def update_source_string(name: str, key: str, value: str) -> bool:
+    # queue for the OBS thread, obs_source_update is never called from loop
+    with pendingLock:
+        if pendingValues.get((name, key), pushedValues.get((name, key))) == value:
+            metrics.inc("source_update_skipped")
+            return False
+        pendingValues[(name, key)] = value
+    return True
+
+@metrics.timed("obs_source_update")
+def apply_source_string(name: str, key: str, value: str):
+    source = obs.obs_get_source_by_name(name)
+    if not source:
+        return
     settings = obs.obs_data_create()
-    obs.obs_data_set_string(settings, "text", now_playing)
-    source = obs.obs_get_source_by_name(source_name)
+    obs.obs_data_set_string(settings, key, value)
     obs.obs_source_update(source, settings)
     obs.obs_data_release(settings)
     obs.obs_source_release(source)
+    pushedValues[(name, key)] = value
+    metrics.inc("source_update_applied")
+
+def drain_source_updates():
+    # runs on the OBS thread, every frame
+    if not pendingValues:
+        return
+    start = time.perf_counter()
+    while time.perf_counter() - start < DRAIN_BUDGET:
+        with pendingLock:
+            if not pendingValues:
+                break
+            (name, key), value = pendingValues.popitem()
+        apply_source_string(name, key, value)
+    metrics.observe("obs_drain", (time.perf_counter() - start) * 1000)
 
-    log.debug(f"source {source_name}: {now_playing} <- {data}")
+###! <---
+###! SERVE
+###! --->
 
-def update_thumbnail(file: str):
-    props = obs.obs_data_create()
-    obs.obs_data_set_string(props, "file", file)
-    thumbsrc = obs.obs_get_source_by_name(thumbsource_name)
-    obs.obs_source_update(thumbsrc, props)
-    obs.obs_data_release(props)
-    obs.obs_source_release(thumbsrc)
-
-    log.debug(
-        f"source {thumbsource_name}: {file}"
-    )
+class Consumer:
+    """Receives every published snapshot and art file, on loop"""
+
+    def snapshot(self, data: MediaSnapshot | None):
+        pass
+
+    def art(self, file: str):
+        pass
+
+
+class ObsSources(Consumer):
+    def snapshot(self, data: MediaSnapshot | None):
+        update_text(data)
+
+    def art(self, file: str):
+        update_thumbnail(file)
+
+
+class FileSink(Consumer):
+    """Rendered text and snapshot JSON for tools outside OBS
+
+    Files are replaced atomically and only when their content changes, at most
+    once per output_min_interval; the latest content wins.
+    """
+
+    def __init__(self):
+        # path -> content on disk (or being written)
+        self.written: dict[str, str] = {}
+        self.pending: dict[str, str] = {}
+        self.lastwrite = -math.inf
+        self.task: asyncio.Task | None = None
+
+    def text(self, rendered: str):
+        if output_text_path:
+            self.offer(output_text_path, rendered)
+
+    def snapshot(self, data: MediaSnapshot | None):
+        if output_json_path:
+            self.offer(output_json_path, json.dumps(snapshot_json(data), ensure_ascii=False))
+
+    def offer(self, path: str, content: str):
+        # must be called on loop
+        if content == self.written.get(path):
+            self.pending.pop(path, None)
+            return
+        self.pending[path] = content
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self.flush())
+
+    async def flush(self):
+        while self.pending:
+            delay = self.lastwrite + output_min_interval / 1000 - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending, self.pending = self.pending, {}
+            self.lastwrite = loop.time()
+            for path, content in pending.items():
+                self.written[path] = content
+                try:
+                    await loop.run_in_executor(tpool, write_file_atomic, path, content)
+                except OSError:
+                    log.warning(f"Failed to write {path}", exc_info=True)
+                    self.written.pop(path, None)
+                else:
+                    metrics.inc("file_writes")
+
+
+class ProgressBar(Consumer):
+    """Timeline bar for an image source, redrawn a pixel column at a time
+
+    The BMP is kept in memory (image) and only the columns between the old
+    and the new fill are rewritten; a file is published only when the fill
+    moves, alternating between two names so the source always sees a new
+    path and never a file being written.
+    """
+    HEADER = 14 + 108 # BITMAPFILEHEADER + BITMAPV4HEADER
+    MIN_INTERVAL = FRAME_INTERVAL # s, no point in updating faster than the sources are
+
+    def __init__(self):
+        self.data: MediaSnapshot | None = None
+        self.image = bytearray()
+        self.size = (0, 0)
+        self.colors = (b"", b"")
+        self.filled = -1 # columns currently drawn in the fg color, -1 before the first draw
+        self.handle: asyncio.TimerHandle | None = None
+        self.flip = 0
+        self.pending: bytes | None = None
+        self.task: asyncio.Task | None = None
+
+    @staticmethod
+    def bgra(abgr: int) -> bytes:
+        return bytes(((abgr >> 16) & 0xFF, (abgr >> 8) & 0xFF, abgr & 0xFF, (abgr >> 24) & 0xFF))
+
+    def base(self, width: int, height: int) -> bytearray:
+        pixels = width * height * 4
+        header = struct.pack(
+            "<2sIHHI" "IiiHHIIiiII" "IIII" "I36x12x",
+            b"BM", self.HEADER + pixels, 0, 0, self.HEADER,
+            108, width, -height, 1, 32, 3, pixels, 2835, 2835, 0, 0, # BI_BITFIELDS, top-down
+            0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000,
+            0x73524742, # 'sRGB'
+        )
+        return bytearray(header) + self.colors[1] * (width * height)
+
+    def reconfigure(self):
+        # on loop, after script_update
+        size = (max(1, progress_width), max(1, progress_height))
+        colors = (self.bgra(progress_fg), self.bgra(progress_bg))
+        if (size, colors) != (self.size, self.colors):
+            self.size = size
+            self.colors = colors
+            self.image = self.base(*size)
+        self.filled = -1
+        self.update()
+
+    def fill(self, start: int, end: int, color: bytes):
+        width, height = self.size
+        run = color * (end - start)
+        for row in range(height):
+            offset = self.HEADER + (row * width + start) * 4
+            self.image[offset:offset + len(run)] = run
+
+    def snapshot(self, data: MediaSnapshot | None):
+        self.data = data
+        self.update()
+
+    def stop(self):
+        # on loop; the next snapshot starts it again
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+        self.data = None
+        self.pending = None
+
+    def update(self):
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+        data = self.data
+        if not progress_source or not self.image:
+            return
+        if not data or not data.end_time or not posavail(data):
+            update_source_string(progress_source, "file", "")
+            self.filled = -1
+            return
+        width = self.size[0]
+        length = data.end_time.total_seconds()
+        pos = min(max(predicted_position(data).total_seconds(), 0.0), length)
+        filled = int(width * pos / length)
+        if filled != self.filled:
+            if self.filled < 0:
+                self.fill(0, width, self.colors[1])
+                self.filled = 0
+            if filled > self.filled:
+                self.fill(self.filled, filled, self.colors[0])
+            else:
+                self.fill(filled, self.filled, self.colors[1])
+            self.filled = filled
+            self.publish()
+        rate = data.playback_rate
+        if data.playback_status != 'Playing' or not rate:
+            return
+        # position where the fill next changes by a column
+        boundary = (filled + 1 if rate > 0 else filled) * length / width
+        delay = max((boundary - pos) / rate, self.MIN_INTERVAL)
+        if 0 < boundary <= length:
+            self.handle = loop.call_later(delay + REFRESH_MARGIN, self.update)
+
+    def publish(self):
+        self.pending = bytes(self.image)
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self.write())
+
+    async def write(self):
+        while self.pending is not None and thumbdir:
+            content, self.pending = self.pending, None
+            self.flip ^= 1
+            path = os.path.join(thumbdir, f"progress-{self.flip}.bmp")
+            try:
+                await loop.run_in_executor(tpool, write_file_atomic, path, content)
+            except OSError:
+                log.warning(f"Failed to write {path}", exc_info=True)
+                continue
+            update_source_string(progress_source, "file", path)
+            metrics.inc("progress_updates")
+
+
+fileSink = FileSink()
+progressBar = ProgressBar()
+consumers: list[Consumer] = [] if obs is None else [ObsSources(), fileSink, progressBar]
+lastArt = ""
+
+def publish(data: MediaSnapshot | None):
+    for consumer in consumers:
+        try:
+            consumer.snapshot(data)
+        except Exception:
+            log.warning(f"{type(consumer).__name__} failed on snapshot", exc_info=True)
+
+def publish_art(file: str):
+    global lastArt
+    lastArt = file
+    for consumer in consumers:
+        try:
+            consumer.art(file)
+        except Exception:
+            log.warning(f"{type(consumer).__name__} failed on art", exc_info=True)
+
+
+def snapshot_json(data: MediaSnapshot | None) -> dict[str, Any] | None:
+    if data is None:
+        return None
+    result: dict[str, Any] = {}
+    for name in SNAPSHOT_FIELDS:
+        if name == "thumbnail":
+            continue
+        value = getattr(data, name)
+        if isinstance(value, timedelta):
+            value = value.total_seconds()
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        result[name] = value
+    return result
+
+
+class SnapshotServer(Consumer):
+    """Serves the current snapshot and art to any number of local overlays
+
+    GET /snapshot for polling, /events for Server-Sent Events, /ws for a
+    WebSocket, /art/<name> for the art named in the last message. Every client
+    has a small queue; a slow one loses its oldest messages instead of
+    holding up capture or the other clients.
+    """
+    CLIENT_QUEUE = 8
+    KEEPALIVE = 15 # s
+
+    def __init__(self):
+        self.data: MediaSnapshot | None = None
+        self.artfile: str | None = None
+        self.message = self.encode()
+        # queue -> the handler task serving it
+        self.clients: dict[asyncio.Queue[str], asyncio.Task] = {}
+        self.runner: "web.AppRunner | None" = None
+
+    def encode(self) -> str:
+        art = f"/art/{os.path.basename(self.artfile)}" if self.artfile else None
+        return json.dumps({"snapshot": snapshot_json(self.data), "art": art})
+
+    def snapshot(self, data: MediaSnapshot | None):
+        self.data = data
+        self.broadcast()
+
+    def art(self, file: str):
+        self.artfile = file or None
+        self.broadcast()
+
+    def broadcast(self):
+        message = self.encode()
+        if message == self.message:
+            return
+        self.message = message
+        for queue in self.clients:
+            if queue.full():
+                queue.get_nowait()
+                metrics.inc("serve_dropped")
+            queue.put_nowait(message)
+
+    def subscribe(self) -> asyncio.Queue[str]:
+        queue: asyncio.Queue[str] = asyncio.Queue(self.CLIENT_QUEUE)
+        queue.put_nowait(self.message)
+        self.clients[queue] = cast(asyncio.Task, asyncio.current_task())
+        return queue
+
+    async def handle_snapshot(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+        return web.Response(
+            text=self.message, content_type="application/json",
+            headers={"Access-Control-Allow-Origin": "*", "Cache-Control": "no-cache"},
+        )
+
+    async def handle_events(self, request: "web.Request") -> "web.StreamResponse":
+        from aiohttp import web
+        resp = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*",
+        })
+        await resp.prepare(request)
+        queue = self.subscribe()
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), self.KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await resp.write(b": keepalive\n\n")
+                    continue
+                await resp.write(f"data: {message}\n\n".encode())
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(queue, None)
+        return resp
+
+    async def handle_ws(self, request: "web.Request") -> "web.WebSocketResponse":
+        from aiohttp import web
+        ws = web.WebSocketResponse(heartbeat=self.KEEPALIVE)
+        await ws.prepare(request)
+        queue = self.subscribe()
+
+        async def pump():
+            while True:
+                await ws.send_str(await queue.get())
+
+        sender = asyncio.ensure_future(pump())
+        try:
+            # nothing to receive, this only notices the client going away
+            async for _ in ws:
+                pass
+        finally:
+            sender.cancel()
+            self.clients.pop(queue, None)
+        return ws
+
+    async def handle_art(self, request: "web.Request") -> "web.StreamResponse":
+        # only the current file, names are content derived so it never changes
+        from aiohttp import web
+        if not self.artfile or request.match_info["name"] != os.path.basename(self.artfile):
+            raise web.HTTPNotFound()
+        return web.FileResponse(self.artfile, headers={
+            "Access-Control-Allow-Origin": "*",
+            "Cache-Control": "public, max-age=31536000, immutable",
+        })
+
+    async def start(self, host: str, port: int):
+        from aiohttp import web # the first start pays for the import, not OBS startup
+        app = web.Application()
+        app.router.add_get("/snapshot", self.handle_snapshot)
+        app.router.add_get("/events", self.handle_events)
+        app.router.add_get("/ws", self.handle_ws)
+        app.router.add_get("/art/{name}", self.handle_art)
+        self.runner = web.AppRunner(app, access_log=None, handle_signals=False)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        log.info(f"Serving snapshots on http://{host}:{port}/")
+
+    async def stop(self):
+        # streams never end on their own, cleanup() would wait for them
+        for task in self.clients.values():
+            task.cancel()
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+server: SnapshotServer | None = None
+
+async def serve(port: int, host: str | None = None):
+    # (re)start the snapshot server on port, 0 stops it
+    global server
+    if server:
+        consumers.remove(server)
+        await server.stop()
+        server = None
+    if not port:
+        return
+    server = SnapshotServer()
+    # start with what is already on screen
+    server.data = lastData
+    server.artfile = lastArt or None
+    server.message = server.encode()
+    try:
+        await server.start(host or serve_host, port)
+    except OSError:
+        log.error(f"Cannot serve on port {port}", exc_info=True)
+        server = None
+        return
+    consumers.append(server)
 
 
 ###! <---
@@ -637,17 +2443,27 @@ def update_thumbnail(file: str):
 ###! --->
 
 
-tpool = ThreadPoolExecutor(4, "smc_pool_thread_")
-loop = asyncio.new_event_loop()
-loop.set_default_executor(tpool)
+# created by createloop(), not at import
+tpool: ThreadPoolExecutor
+loop: asyncio.AbstractEventLoop
 loopthread: threading.Thread | None = None
 
+def createloop():
+    global tpool
+    global loop
+    global lifecycleLock
+    tpool = ThreadPoolExecutor(4, "smc_pool_thread_")
+    loop = asyncio.new_event_loop()
+    loop.set_default_executor(tpool)
+    lifecycleLock = None
+
 def startevthread():
     global loopthread
     log.debug("Starting event loop thread")
     if loopthread and loopthread.is_alive():
         log.warning("loopthread is still alive!!!", stack_info=True)
         loop.stop()
+    createloop()
     loopthread = threading.Thread(
         target=loop.run_forever, name="smc_evloop", daemon=True
     )
@@ -655,27 +2471,246 @@ def startevthread():
     loopthread.start()
 
 
+class UpdateCoalescer:
+    """Fold a burst of media events into one update, at most one running at a time"""
+
+    def __init__(self, update: Callable[..., Coroutine]):
+        self.update = update
+        self.dirty = False
+        self.thumb = False
+        self.task: asyncio.Task | None = None
+        self.requests = 0
+        self.runs = 0
+
+    def request(self, *, thumb: bool = True):
+        # must be called on loop
+        self.requests += 1
+        self.dirty = True
+        self.thumb = self.thumb or thumb
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self._run())
+
+    async def _run(self):
+        requests = self.requests
+        while self.dirty:
+            # events arriving meanwhile, including during the update, fold into the next run
+            await asyncio.sleep(debounce / 1000)
+            self.dirty = False
+            thumb, self.thumb = self.thumb, False
+            self.runs += 1
+            try:
+                await self.update(thumb=thumb)
+            except Exception:
+                log.warning("Coalesced update failed", exc_info=True)
+        log.debug(f"coalesced {self.requests - requests + 1} events, {self.runs} updates in total")
+
+
+coalescer = UpdateCoalescer(lambda *, thumb: smcFlushAsync(thumb=thumb))
+
+def request_update(*, thumb: bool = True):
+    # thread-safe entry for media event callbacks
+    loop.call_soon_threadsafe(lambda: coalescer.request(thumb=thumb))
+
+
+refreshHandle: asyncio.TimerHandle | None = None
+REFRESH_MARGIN = 0.001 # s, land just past the boundary
+VOLATILE_REFRESH = 0.5 # s, for expressions whose changes cannot be predicted
+
+def next_refresh(data: MediaSnapshot | None) -> float | None:
+    # seconds until the rendered text can next change, None if only an event can change it
+    if not display_expr or not display_expr.dynamic_names or not data:
+        return None
+    if display_expr.dynamic_names - DYNAMIC_NAMES:
+        return VOLATILE_REFRESH
+    rate = data.playback_rate
+    if data.playback_status != 'Playing' or not rate or not posavail(data):
+        return None
+    pos = predicted_position(data).total_seconds()
+    boundaries = []
+    if "predictedpos" in display_expr.dynamic_names:
+        # roundtd() flips on every half second
+        if rate > 0:
+            boundaries.append(math.floor(pos + 0.5) + 0.5)
+        else:
+            boundaries.append(math.ceil(pos - 0.5) - 0.5)
+    if display_expr.dynamic_names & LYRIC_NAMES and (lyrics := lyrics_for(data)):
+        if (change := lyrics.next_change(pos, rate)) is not None:
+            boundaries.append(change)
+    if not boundaries:
+        return None
+    return min((boundary - pos) / rate for boundary in boundaries) + REFRESH_MARGIN
+
+def schedule_refresh(data: MediaSnapshot | None):
+    global refreshHandle
+    cancel_refresh()
+    delay = next_refresh(data)
+    if delay is not None:
+        refreshHandle = loop.call_later(delay, on_refresh)
+
+def cancel_refresh():
+    global refreshHandle
+    if refreshHandle:
+        refreshHandle.cancel()
+        refreshHandle = None
+
+def on_refresh():
+    global refreshHandle
+    refreshHandle = None
+    update_text(lastData)
+
+
+LAG_INTERVAL = 1 # s
+METRICS_DUMP_INTERVAL = 15 # s
+
+def write_file_atomic(path: str, content: str | bytes):
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    with open(path + ".part", "wb") as f:
+        f.write(content)
+    os.replace(path + ".part", path)
+
+async def monitor_loop():
+    # loop lag: how late a sleep on the event loop wakes up
+    lastdump = loop.time()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        metrics.observe("loop_lag", max(0.0, loop.time() - start - LAG_INTERVAL) * 1000)
+        if metrics_path and loop.time() - lastdump >= METRICS_DUMP_INTERVAL:
+            lastdump = loop.time()
+            try:
+                await loop.run_in_executor(tpool, write_file_atomic, metrics_path, metrics.prometheus())
+            except OSError:
+                log.warning(f"Failed to write metrics to {metrics_path}", exc_info=True)
+
+
 def runcoro(coro: Coroutine, timeout: float | None = None):
     fut = asyncio.run_coroutine_threadsafe(coro, loop)
     return fut.result(timeout)
 
 
+def submit(coro: Coroutine) -> concurrent.futures.Future:
+    # fire and forget, never blocks the calling (OBS) thread
+    fut = asyncio.run_coroutine_threadsafe(coro, loop)
+    def callback(f: concurrent.futures.Future):
+        if not f.cancelled() and (exc := f.exception()):
+            log.error('submitted coroutine failed', exc_info=exc)
+    fut.add_done_callback(callback)
+    return fut
+
+
+lifecycleLock: asyncio.Lock | None = None
+
+async def serially(*steps: Callable[[], Coroutine]):
+    # keeps init/deinit/update submitted by script_update in submission order
+    global lifecycleLock
+    if lifecycleLock is None:
+        lifecycleLock = asyncio.Lock()
+    async with lifecycleLock:
+        for step in steps:
+            await step()
+
+
 def script_load(_):
     global thumbdir
     log.debug("script_load()")
     thumbdir = tempfile.mkdtemp(prefix="smcinfo_thumbs_")
+    configure_thumbcache()
     startevthread()
+    submit(monitor_loop())
+
+def script_tick(seconds):
+    # every frame: a timer would add up to its interval to every update, and an
+    # empty queue costs one dict check
+    drain_source_updates()
 
 def script_unload():
     global thumbdir
+    global thumbcache
     log.debug("script_unload()")
+    log.debug(f"metrics: {metrics.snapshot()}")
+    if thumbcache:
+        thumbcache.save()
+        thumbcache = None
     if thumbdir:
         shutil.rmtree(thumbdir)
         thumbdir = None
+    loop.call_soon_threadsafe(cancel_refresh)
+    loop.call_soon_threadsafe(progressBar.stop)
     runcoro(smcDeinitalizeAsync(), 5)
+    runcoro(serve(0), 5)
     [task.cancel("plugin unloaded") for task in asyncio.all_tasks(loop)]
     loop.stop()
+    tpool.shutdown(wait=False)
+
+
+###! <---
+###! DAEMON
+###! --->
+
+async def daemon(host: str, port: int):
+    await serve(port, host)
+    if not server:
+        raise SystemExit(1)
+    await smcInitalizeAsync()
+    await monitor_loop()
+
+def main():
+    # one capture for any number of overlays and OBS profiles, without OBS
+    global session_name
+    global debounce
+    global thumb_size
+    global metrics_path
+    global thumbdir
+    global thumbcache
+    global output_json_path
+    global output_min_interval
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the now playing snapshot and art to local overlays")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--session", default="<default>", help="media session to follow")
+    parser.add_argument("--thumb-size", type=int, default=0, help="downscale art to this many px, 0 keeps the original")
+    parser.add_argument("--debounce", type=int, default=50, help="ms")
+    parser.add_argument("--metrics-path", default="", help="write Prometheus metrics here")
+    parser.add_argument("--json-file", default="", help="also keep the snapshot JSON in this file")
+    parser.add_argument("--min-interval", type=int, default=1000, help="ms between writes of --json-file")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(args.log_level)
+    session_name = args.session
+    debounce = args.debounce
+    thumb_size = args.thumb_size
+    metrics_path = args.metrics_path
+    output_json_path = args.json_file
+    output_min_interval = args.min_interval
+    if output_json_path:
+        consumers.append(fileSink)
+    thumbdir = tempfile.mkdtemp(prefix="smcinfo_thumbs_")
+    configure_thumbcache()
+    createloop()
+    asyncio.set_event_loop(loop)
+    task = loop.create_task(daemon(args.host, args.port))
+    try:
+        loop.add_signal_handler(signal.SIGTERM, task.cancel)
+    except NotImplementedError:
+        pass # Windows, Ctrl+C still works
+    try:
+        loop.run_until_complete(task)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        loop.run_until_complete(smcDeinitalizeAsync())
+        loop.run_until_complete(serve(0))
+        if thumbcache:
+            thumbcache.save()
+            thumbcache = None
+        shutil.rmtree(thumbdir)
+        log.debug(f"metrics: {metrics.snapshot()}")
+
 
+if __name__ == "__main__":
+    main()
 
-def on_timer():
-    runcoro(smcUpdateAsync(thumb=False, capture=False))